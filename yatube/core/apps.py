@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import configure_sqlite
+        from .metrics import instrument_templates
+        connection_created.connect(
+            configure_sqlite, dispatch_uid='core.configure_sqlite')
+        instrument_templates()
@@ -0,0 +1,87 @@
+"""Кэширование с защитой от лавины пересчётов (cache stampede).
+
+Запись хранит значение, время логического устаревания и длительность
+последнего пересчёта. Незадолго до устаревания запись с растущей
+вероятностью пересчитывается заранее (алгоритм XFetch), а пересчёт
+выполняет только процесс, взявший блокировку в кэше; остальные в это
+время отдают прежнее значение. Поэтому после устаревания фрагмента
+ленты его собирает один обработчик, а не все процессы разом.
+
+Ключ записи не зависит от данных: версия данных (например, поколения
+областей из posts.cache) хранится в самой записи. Запись другой версии
+считается устаревшей так же, как по времени, поэтому и после
+изменения данных фрагмент пересобирает один процесс, а остальные
+до конца пересчёта отдают прежний.
+
+Блокировка — cache.add(). Он атомарен в memcached, а FileBasedCache
+проверяет и записывает файл в два шага, поэтому с ним блокировку
+изредка берут сразу несколько процессов.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+from .metrics import record_cache
+
+LOCK_KEY = '{}:lock'
+# Сколько устаревшее значение хранится после логического устаревания,
+# чтобы было что отдать, пока другой процесс пересчитывает.
+STALE_TIMEOUT = 60 * 5
+# Блокировка пересчёта снимается сама, если процесс упал.
+LOCK_TIMEOUT = 30
+# Больше — раньше начинается досрочный пересчёт.
+BETA = 1.0
+
+
+def _needs_recompute(entry, beta):
+    """XFetch: пересчитывать ли запись сейчас."""
+    if entry is None:
+        return True
+    # -log(random()) — экспоненциально распределённый запас времени,
+    # пропорциональный длительности пересчёта.
+    early = entry['delta'] * beta * -math.log(1.0 - random.random())
+    return time.time() + early >= entry['expires']
+
+
+def get_or_recompute(key, compute, timeout, beta=BETA,
+                     stale_timeout=STALE_TIMEOUT, lock_timeout=LOCK_TIMEOUT,
+                     name='fragment', version=None):
+    """Значение из кэша или результат compute() с защитой от лавины.
+
+    timeout=None — без логического устаревания; version — версия
+    данных, запись другой версии устарела; name — имя для метрик
+    попаданий и промахов (core.metrics).
+    """
+    entry = cache.get(key)
+    if entry is not None and entry.get('version') == version and (
+            timeout is None or not _needs_recompute(entry, beta)):
+        record_cache(name, hit=True)
+        return entry['value']
+    lock_key = LOCK_KEY.format(key)
+    locked = cache.add(lock_key, True, lock_timeout)
+    if not locked and entry is not None:
+        # Пересчитывает другой процесс — отдаём прежнее значение.
+        record_cache(name, hit=True)
+        return entry['value']
+    record_cache(name, hit=False)
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        if timeout is None:
+            expires, physical_timeout = math.inf, None
+        else:
+            expires = time.time() + timeout
+            physical_timeout = timeout + stale_timeout
+        cache.set(
+            key,
+            {'value': value, 'expires': expires, 'delta': delta,
+             'version': version},
+            physical_timeout
+        )
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
@@ -0,0 +1,24 @@
+"""Настройка соединений SQLite.
+
+При каждом новом соединении выполняются PRAGMA из settings.SQLITE_PRAGMAS:
+журнал WAL позволяет читать ленты во время записи поста, synchronous
+NORMAL убирает fsync на каждую транзакцию (в режиме WAL это безопасно
+для целостности базы), mmap_size и cache_size держат горячие страницы
+в памяти, а busy_timeout заставляет писателя подождать блокировку
+вместо немедленной ошибки «database is locked».
+"""
+from django.conf import settings
+
+
+def pragma_statements(pragmas):
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: применяет SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
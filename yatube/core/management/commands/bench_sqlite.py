@@ -0,0 +1,129 @@
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.db import pragma_statements
+from posts.models import Post, User
+
+
+def feed_query():
+    """SQL первой страницы главной ленты с параметрами для sqlite3."""
+    queryset = Post.objects.for_feed()[:settings.PER_PAGE]
+    sql, params = queryset.query.sql_with_params()
+    return sql.replace('%s', '?'), params
+
+
+class Worker(threading.Thread):
+    """Поток, который выполняет одно действие, пока не поднят флаг stop."""
+
+    def __init__(self, path, pragmas, action, stop):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.action = action
+        self.stop = stop
+        self.timings = []
+        self.errors = 0
+
+    def run(self):
+        db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        for statement in self.pragmas:
+            db.execute(statement)
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            try:
+                self.action(db)
+            except sqlite3.OperationalError:
+                # database is locked: читатель или писатель не дождался.
+                self.errors += 1
+                continue
+            self.timings.append(time.perf_counter() - started)
+        db.close()
+
+
+class Command(BaseCommand):
+    help = ('Измеряет пропускную способность чтения ленты при '
+            'одновременной записи постов в копии базы SQLite')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument(
+            '--seconds', type=float, default=5.0,
+            help='Длительность каждого прогона')
+        parser.add_argument(
+            '--mode', action='append', choices=('delete', 'wal'),
+            help='Режимы журнала для сравнения (по умолчанию оба)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Бенчмарк только для SQLite')
+        source = connection.settings_dict['NAME']
+        if not os.path.exists(source):
+            raise CommandError(f'Нет файла базы {source}')
+        author_id = User.objects.values_list('pk', flat=True).first()
+        if author_id is None:
+            raise CommandError('В базе нет пользователей')
+        sql, params = feed_query()
+
+        def read(db):
+            db.execute(sql, params).fetchall()
+
+        def write(db):
+            db.execute(
+                'INSERT INTO posts_post '
+                '(text, pub_date, author_id, comments_count) '
+                "VALUES ('bench', datetime('now'), ?, 0)",
+                [author_id]
+            )
+
+        for mode in options['mode'] or ['delete', 'wal']:
+            pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+            pragmas['journal_mode'] = mode
+            if mode != 'wal':
+                # Без WAL настройки по умолчанию, как до включения.
+                pragmas = {'journal_mode': mode}
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'bench.sqlite3')
+                shutil.copyfile(source, path)
+                self.run_mode(
+                    mode, path, pragma_statements(pragmas),
+                    read, write, options)
+
+    def run_mode(self, mode, path, pragmas, read, write, options):
+        stop = threading.Event()
+        readers = [
+            Worker(path, pragmas, read, stop)
+            for _ in range(options['readers'])
+        ]
+        writers = [
+            Worker(path, pragmas, write, stop)
+            for _ in range(options['writers'])
+        ]
+        for worker in readers + writers:
+            worker.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for worker in readers + writers:
+            worker.join()
+        reads = [t for worker in readers for t in worker.timings]
+        writes = sum(len(worker.timings) for worker in writers)
+        errors = sum(worker.errors for worker in readers + writers)
+        self.stdout.write(f'Журнал {mode}:')
+        self.stdout.write(
+            f'  чтений ленты: {len(reads) / options["seconds"]:.0f}/с, '
+            f'записей: {writes / options["seconds"]:.0f}/с, '
+            f'ошибок блокировки: {errors}')
+        if len(reads) >= 2:
+            cuts = statistics.quantiles(reads, n=100)
+            self.stdout.write(
+                f'  задержка чтения p50 {cuts[49] * 1000:.2f} мс, '
+                f'p95 {cuts[94] * 1000:.2f} мс')
@@ -0,0 +1,178 @@
+"""Метрики производительности запросов.
+
+RequestMetrics собирает за один запрос число и время SQL-запросов,
+время рендеринга шаблонов, попадания и промахи кэша фрагментов и время
+подбора миниатюр. PerformanceMiddleware (core.middleware) отдаёт их
+в заголовке Server-Timing и строкой JSON в журнал yatube.performance,
+а длительности складывает в скользящее окно по представлениям, из
+которого /internal/metrics/ считает перцентили. Окно своё у каждого
+процесса.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.template.base import Template
+
+_state = threading.local()
+_windows = {}
+_windows_lock = threading.Lock()
+PERCENTILES = (50, 95, 99)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.thumbnail_time = 0.0
+        # Имя фрагмента -> [попадания, промахи].
+        self.cache = defaultdict(lambda: [0, 0])
+        self.template_depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    @property
+    def cache_hits(self):
+        return sum(hits for hits, _ in self.cache.values())
+
+    @property
+    def cache_misses(self):
+        return sum(misses for _, misses in self.cache.values())
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        entries = [
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.db_queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'thumb;dur={self.thumbnail_time * 1000:.1f}',
+            f'cache;desc="hit {self.cache_hits} miss {self.cache_misses}"',
+        ]
+        for name, (hits, misses) in sorted(self.cache.items()):
+            entries.append(f'cache-{name};desc="hit {hits} miss {misses}"')
+        entries.append(f'total;dur={self.duration * 1000:.1f}')
+        return ', '.join(entries)
+
+    def as_dict(self):
+        return {
+            'duration_ms': round(self.duration * 1000, 1),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'thumbnail_ms': round(self.thumbnail_time * 1000, 1),
+            'cache': {
+                name: {'hits': hits, 'misses': misses}
+                for name, (hits, misses) in self.cache.items()
+            },
+        }
+
+
+def start():
+    _state.metrics = RequestMetrics()
+    return _state.metrics
+
+
+def stop():
+    _state.metrics = None
+
+
+def current():
+    """Метрики текущего запроса или None вне PerformanceMiddleware."""
+    return getattr(_state, 'metrics', None)
+
+
+def record_cache(name, hit):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache[name][0 if hit else 1] += 1
+
+
+@contextmanager
+def timed(attribute):
+    """Прибавляет время блока к полю attribute метрик запроса."""
+    metrics = current()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            elapsed = time.perf_counter() - started
+            setattr(metrics, attribute, getattr(metrics, attribute) + elapsed)
+
+
+def instrument_templates():
+    """Засекает рендеринг шаблонов; вложенные include не суммируются."""
+    original = Template.render
+    if getattr(original, 'instrumented', False):
+        return
+
+    @wraps(original)
+    def render(self, context):
+        metrics = current()
+        if metrics is None or metrics.template_depth:
+            return original(self, context)
+        metrics.template_depth += 1
+        try:
+            with timed('template_time'):
+                return original(self, context)
+        finally:
+            metrics.template_depth -= 1
+
+    render.instrumented = True
+    Template.render = render
+
+
+def record(view, metrics):
+    """Добавляет длительности запроса в окно представления view."""
+    with _windows_lock:
+        window = _windows.get(view)
+        if window is None:
+            window = _windows[view] = deque(
+                maxlen=settings.PERFORMANCE_WINDOW)
+        window.append((metrics.duration, metrics.db_time, metrics.db_queries))
+
+
+def _percentile(values, percent):
+    """Перцентиль по ближайшему рангу в отсортированном списке."""
+    rank = max(0, -(-len(values) * percent // 100) - 1)
+    return values[rank]
+
+
+def snapshot():
+    """Перцентили длительностей по представлениям, мс."""
+    with _windows_lock:
+        windows = {view: list(window) for view, window in _windows.items()}
+    result = {}
+    for view, samples in sorted(windows.items()):
+        durations = sorted(sample[0] * 1000 for sample in samples)
+        db_times = sorted(sample[1] * 1000 for sample in samples)
+        queries = sorted(sample[2] for sample in samples)
+        stats = {'count': len(samples)}
+        for percent in PERCENTILES:
+            stats[f'p{percent}_ms'] = round(
+                _percentile(durations, percent), 1)
+            stats[f'db_p{percent}_ms'] = round(
+                _percentile(db_times, percent), 1)
+        stats['queries_p95'] = _percentile(queries, 95)
+        result[view] = stats
+    return result
+
+
+def reset():
+    with _windows_lock:
+        _windows.clear()
@@ -0,0 +1,132 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, queries, routers
+
+PIN_COOKIE = 'primary_until'
+
+logger = logging.getLogger('yatube.performance')
+queries_logger = logging.getLogger('yatube.queries')
+
+
+def wrap_connections(stack, wrapper):
+    """Подключает execute_wrapper ко всем базам до выхода из stack."""
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else 'unresolved'
+
+
+class ReplicaPinningMiddleware:
+    """Закрепляет за основной базой пользователя, который только что
+    записал данные, чтобы чтение с реплики не скрыло его изменения."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            until = 0
+        routers.start_request(pinned=until > time.time())
+        response = self.get_response(request)
+        if routers.replica_configured() and routers.wrote_to_primary():
+            response.set_cookie(
+                PIN_COOKIE,
+                str(time.time() + settings.REPLICA_PIN_SECONDS),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        routers.start_request(pinned=False)
+        return response
+
+
+def server_timing_allowed(request):
+    """Server-Timing отдаётся при DEBUG или SERVER_TIMING_PUBLIC,
+    а иначе — только сотрудникам и адресам INTERNAL_IPS."""
+    if settings.DEBUG or settings.SERVER_TIMING_PUBLIC:
+        return True
+    if request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+class PerformanceMiddleware:
+    """Метрики запроса: заголовок Server-Timing, строка JSON в журнале
+    yatube.performance и окно длительностей представления (core.metrics).
+
+    Стоит первым в MIDDLEWARE, чтобы учитывать запросы сессий и
+    пользователей. У потоковых ответов учитывается только работа
+    до начала отправки. Server-Timing видят не все (server_timing_allowed).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start()
+        try:
+            with ExitStack() as stack:
+                wrap_connections(stack, request_metrics.execute_wrapper)
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        request_metrics.finish()
+        view = view_name(request)
+        if server_timing_allowed(request):
+            response['Server-Timing'] = request_metrics.server_timing()
+        metrics.record(view, request_metrics)
+        line = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            **request_metrics.as_dict(),
+        }
+        slow = (request_metrics.duration * 1000
+                > settings.PERFORMANCE_SLOW_REQUEST_MS)
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            json.dumps(line, ensure_ascii=False))
+        return response
+
+
+class QueryInspectionMiddleware:
+    """Ищет N+1 и медленные SQL-запросы представлений (core.queries).
+
+    Работает при QUERY_INSPECTION; в строгом режиме
+    (QUERY_INSPECTION_STRICT) N+1 и превышение бюджета query_budget
+    роняют запрос исключением QueryProblems.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inspector = queries.QueryInspector()
+        with ExitStack() as stack:
+            wrap_connections(stack, inspector)
+            response = self.get_response(request)
+        budget = queries.current_budget()
+        problems = queries.describe(view_name(request), inspector, budget)
+        for line in problems:
+            queries_logger.warning(line)
+        over_budget = budget is not None and inspector.total > budget
+        if settings.QUERY_INSPECTION_STRICT and (
+                over_budget or inspector.repeated()):
+            raise queries.QueryProblems('\n'.join(problems))
+        return response
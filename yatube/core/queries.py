@@ -0,0 +1,162 @@
+"""Поиск N+1 и медленных SQL-запросов.
+
+QueryInspector группирует запросы одного HTTP-запроса по форме —
+SQL без значений параметров — и находит формы, которые выполнялись
+QUERY_REPEAT_LIMIT раз и больше (обычно N+1: связанный объект читается
+в цикле), и запросы дольше SLOW_QUERY_MS. Для каждой находки
+запоминается представление, строка шаблона и строка кода проекта,
+откуда выполнен запрос.
+
+QueryInspectionMiddleware пишет находки в журнал yatube.queries.
+В строгом режиме (QUERY_INSPECTION_STRICT, его включает тестовый
+раннер core.testing.QueryInspectionRunner) N+1 и превышение бюджета,
+объявленного query_budget, роняют запрос исключением QueryProblems.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import ContextDecorator
+
+from django.conf import settings
+
+_state = threading.local()
+
+# Литералы, которые попадают прямо в текст SQL (raw и extra).
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+# Собственные кадры инспектора и метрик не считаются местом запроса.
+SKIPPED_FILES = ('core/queries.py', 'core/metrics.py', 'core/middleware.py')
+
+
+class QueryProblems(AssertionError):
+    """Запрос нарушил бюджет SQL-запросов в строгом режиме."""
+
+
+def query_shape(sql):
+    """SQL без значений: одинаковые по смыслу запросы совпадают."""
+    shape = STRING_RE.sub('?', sql)
+    shape = NUMBER_RE.sub('?', shape)
+    shape = IN_LIST_RE.sub('IN (...)', shape)
+    return SPACE_RE.sub(' ', shape).strip()
+
+
+def _template_line(frame):
+    node = frame.f_locals.get('self')
+    token = getattr(node, 'token', None)
+    origin = getattr(node, 'origin', None)
+    if token is None or origin is None:
+        return None
+    return f'{origin.template_name}:{token.lineno}'
+
+
+def _code_line(frame):
+    filename = frame.f_code.co_filename
+    if (not filename.startswith(settings.BASE_DIR)
+            or 'site-packages' in filename
+            or filename.endswith(SKIPPED_FILES)):
+        return None
+    return f'{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno}'
+
+
+def query_origin():
+    """(строка шаблона, строка кода проекта) ближайшие к запросу."""
+    template = code = None
+    frame = sys._getframe(1)
+    while frame is not None and (template is None or code is None):
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            template = _template_line(frame)
+        if code is None:
+            code = _code_line(frame)
+        frame = frame.f_back
+    return template, code
+
+
+class QueryInspector:
+    """execute_wrapper, собирающий формы и длительности запросов."""
+
+    def __init__(self):
+        self.total = 0
+        # Форма -> {'count', 'seconds', 'template', 'code'}.
+        self.shapes = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - started)
+
+    def record(self, sql, seconds):
+        self.total += 1
+        shape = query_shape(sql)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            entry = self.shapes[shape] = {'count': 0, 'seconds': 0.0}
+        entry['count'] += 1
+        entry['seconds'] += seconds
+        if entry['count'] == settings.QUERY_REPEAT_LIMIT:
+            entry['template'], entry['code'] = query_origin()
+        if seconds * 1000 >= settings.SLOW_QUERY_MS:
+            template, code = query_origin()
+            self.slow.append({
+                'sql': sql, 'ms': round(seconds * 1000, 1),
+                'template': template, 'code': code,
+            })
+
+    def repeated(self):
+        return [
+            dict(entry, shape=shape)
+            for shape, entry in self.shapes.items()
+            if entry['count'] >= settings.QUERY_REPEAT_LIMIT
+        ]
+
+
+def _location(entry):
+    places = [entry.get('template'), entry.get('code')]
+    return ', '.join(place for place in places if place) or 'неизвестно'
+
+
+def describe(view, inspector, budget=None):
+    """Строки с находками инспектора для журнала и ошибок."""
+    lines = []
+    for entry in inspector.repeated():
+        lines.append(
+            f'{view}: N+1 — {entry["count"]} одинаковых запросов '
+            f'({_location(entry)}): {entry["shape"][:200]}')
+    for entry in inspector.slow:
+        lines.append(
+            f'{view}: медленный запрос {entry["ms"]} мс '
+            f'({_location(entry)}): {entry["sql"][:200]}')
+    if budget is not None and inspector.total > budget:
+        lines.append(
+            f'{view}: {inspector.total} SQL-запросов при бюджете {budget}')
+    return lines
+
+
+def current_budget():
+    return getattr(_state, 'budget', None)
+
+
+class query_budget(ContextDecorator):
+    """Бюджет SQL-запросов на один HTTP-запрос в строгом режиме.
+
+    with query_budget(5): self.client.get(url) — или декоратор метода
+    теста. Запрос сверх бюджета падает с QueryProblems.
+    """
+
+    def __init__(self, queries):
+        self.queries = queries
+
+    def __enter__(self):
+        self.previous = current_budget()
+        _state.budget = self.queries
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.budget = self.previous
+        return False
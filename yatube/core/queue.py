@@ -0,0 +1,82 @@
+"""Простая надёжная очередь заданий в каталоге файловой системы.
+
+Заменяет брокер сообщений для фоновых задач на одном сервере: каждое
+задание — отдельный JSON-файл. Переходы между состояниями делаются
+атомарным os.replace, поэтому задание не теряется при падении процесса
+и достаётся ровно одному обработчику.
+
+    ready/  — ждут обработки;
+    work/   — взяты обработчиком;
+    failed/ — не удались, повторно не берутся (для разбора вручную);
+    tmp/    — ещё записываются.
+"""
+import json
+import os
+import time
+import uuid
+from collections import namedtuple
+
+Job = namedtuple('Job', 'name payload')
+
+
+class FileQueue:
+    def __init__(self, path):
+        self.path = path
+        for state in ('ready', 'work', 'failed', 'tmp'):
+            os.makedirs(os.path.join(path, state), exist_ok=True)
+
+    def _file(self, state, name):
+        return os.path.join(self.path, state, name)
+
+    def put(self, payload):
+        """Добавляет задание; имя сохраняет порядок постановки."""
+        name = f'{time.time_ns():020d}-{uuid.uuid4().hex}.json'
+        tmp = self._file('tmp', name)
+        with open(tmp, 'w', encoding='utf-8') as job_file:
+            json.dump(payload, job_file, ensure_ascii=False)
+            job_file.flush()
+            os.fsync(job_file.fileno())
+        os.replace(tmp, self._file('ready', name))
+        return name
+
+    def __contains__(self, name):
+        """Задание ещё ждёт обработки или выполняется."""
+        return any(
+            os.path.exists(self._file(state, name))
+            for state in ('ready', 'work'))
+
+    def __len__(self):
+        return len(os.listdir(os.path.join(self.path, 'ready')))
+
+    def claim(self, limit):
+        """Забирает до limit самых старых заданий в работу."""
+        jobs = []
+        for name in sorted(os.listdir(os.path.join(self.path, 'ready'))):
+            if len(jobs) >= limit:
+                break
+            try:
+                os.replace(self._file('ready', name), self._file('work', name))
+            except FileNotFoundError:
+                # Задание забрал другой обработчик.
+                continue
+            with open(self._file('work', name), encoding='utf-8') as job_file:
+                jobs.append(Job(name, json.load(job_file)))
+        return jobs
+
+    def ack(self, job):
+        """Задание выполнено."""
+        os.remove(self._file('work', job.name))
+
+    def fail(self, job):
+        """Задание не удалось: откладывается в failed/."""
+        os.replace(
+            self._file('work', job.name), self._file('failed', job.name))
+
+    def release(self, job):
+        """Возвращает задание в очередь для повторной попытки."""
+        os.replace(self._file('work', job.name), self._file('ready', job.name))
+
+    def recover(self):
+        """Возвращает в очередь задания, брошенные упавшим обработчиком."""
+        for name in os.listdir(os.path.join(self.path, 'work')):
+            os.replace(self._file('work', name), self._file('ready', name))
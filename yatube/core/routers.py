@@ -0,0 +1,111 @@
+"""Чтение лент с реплики базы данных.
+
+Представления, помеченные read_from_replica, читают из базы
+settings.REPLICA_DATABASE; все записи идут в основную базу. Пользователь,
+который только что что-то записал, на REPLICA_PIN_SECONDS закрепляется
+за основной базой (ReplicaPinningMiddleware), чтобы сразу увидеть свой
+пост или комментарий. Если реплика отстаёт больше чем на REPLICA_MAX_LAG
+секунд, чтения тоже возвращаются в основную базу.
+"""
+import threading
+import time
+from functools import wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models import Max
+
+_state = threading.local()
+_lag = {'checked': 0.0, 'value': None}
+
+
+def replica_configured():
+    return bool(settings.REPLICA_DATABASE)
+
+
+def read_from_replica(view):
+    """Декоратор представления: его чтения можно отдать реплике."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_state, 'replica', False)
+        _state.replica = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _state.replica = previous
+    return wrapper
+
+
+def start_request(pinned):
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def wrote_to_primary():
+    return getattr(_state, 'wrote', False)
+
+
+def _latest(alias):
+    app_label, model_name, field = settings.REPLICA_LAG_PROBE.split('.')
+    model = apps.get_model(app_label, model_name)
+    return model._default_manager.using(alias).aggregate(
+        latest=Max(field))['latest']
+
+
+def replica_lag():
+    """Отставание реплики в секундах или None, если она недоступна.
+
+    Сравнивает самое свежее значение поля REPLICA_LAG_PROBE в основной
+    базе и в реплике; результат запоминается на
+    REPLICA_LAG_CHECK_INTERVAL секунд.
+    """
+    alias = settings.REPLICA_DATABASE
+    if not alias or alias not in connections.databases:
+        return None
+    now = time.monotonic()
+    if now - _lag['checked'] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return _lag['value']
+    try:
+        primary = _latest(DEFAULT_DB_ALIAS)
+        replica = _latest(alias)
+    except DatabaseError:
+        lag = None
+    else:
+        if primary is None or (replica is not None and replica >= primary):
+            lag = 0
+        elif replica is None:
+            # В реплике ещё нет данных.
+            lag = None
+        else:
+            lag = (primary - replica).total_seconds()
+    _lag.update(checked=now, value=lag)
+    return lag
+
+
+def replica_available():
+    lag = replica_lag()
+    return lag is not None and lag <= settings.REPLICA_MAX_LAG
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (getattr(_state, 'replica', False)
+                and not getattr(_state, 'pinned', False)
+                and replica_available()):
+            return settings.REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        # Явно: иначе объект, прочитанный из реплики, записался бы туда же.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика получает схему вместе с данными из основной базы.
+        if replica_configured() and db == settings.REPLICA_DATABASE:
+            return False
+        return None
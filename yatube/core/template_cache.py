@@ -0,0 +1,36 @@
+"""Компиляция шаблонов при запуске процесса.
+
+С TEMPLATE_CACHE шаблоны загружаются через cached.Loader: каждый файл
+читается и разбирается один раз на процесс. warm_up() делает это заранее
+для всех шаблонов из DIRS, поэтому первые запросы нового процесса не
+тратят время на разбор, а синтаксическая ошибка в шаблоне видна сразу
+при запуске, а не на редкой странице.
+"""
+import os
+
+from django.template import engines
+
+EXTENSIONS = ('.html', '.txt', '.xml')
+
+
+def template_names(directory):
+    """Имена шаблонов каталога в виде, принятом get_template()."""
+    names = []
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            if file_name.endswith(EXTENSIONS):
+                path = os.path.join(root, file_name)
+                names.append(
+                    os.path.relpath(path, directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_up():
+    """Компилирует шаблоны из DIRS всех движков; возвращает их число."""
+    compiled = 0
+    for engine in engines.all():
+        for directory in engine.dirs:
+            for name in template_names(directory):
+                engine.get_template(name)
+                compiled += 1
+    return compiled
@@ -0,0 +1,28 @@
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class QueryInspectionRunner(DiscoverRunner):
+    """Запускает тесты в строгом режиме поиска N+1 (core.queries).
+
+    Запрос к представлению, который выполняет одинаковые SQL-запросы
+    в цикле или выходит за бюджет query_budget, роняет тест. Очереди
+    фоновых заданий на время прогона переносятся во временный каталог,
+    чтобы тесты не оставляли заданий в рабочем QUEUE_ROOT.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.queue_root = tempfile.mkdtemp(prefix='yatube-queue-')
+        self.query_settings = override_settings(
+            QUERY_INSPECTION=True, QUERY_INSPECTION_STRICT=True,
+            QUEUE_ROOT=self.queue_root)
+        self.query_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.query_settings.disable()
+        shutil.rmtree(self.queue_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,4 +1,18 @@
-from django.test import TestCase
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.template import engines
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from . import metrics, routers
+from .cache import LOCK_KEY, get_or_recompute
+from .middleware import PIN_COOKIE
+from .template_cache import template_names, warm_up
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +21,221 @@ class ViewTestClass(TestCase):
         # Проверьте, что статус ответа сервера - 404
         # Проверьте, что используется шаблон core/404.html
         pass
+
+
+CACHED_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader',
+             settings.TEMPLATE_LOADERS),
+        ],
+    },
+}]
+
+
+@override_settings(TEMPLATES=CACHED_TEMPLATES)
+class TemplateWarmUpTest(TestCase):
+    def test_all_templates_compiled(self):
+        """Прогрев разбирает каждый шаблон из DIRS ровно один раз."""
+        names = template_names(settings.TEMPLATES_DIR)
+        self.assertIn('posts/includes/comments.html', names)
+        self.assertEqual(warm_up(), len(names))
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertTrue(set(names) <= set(loader.get_template_cache))
+        with mock.patch('builtins.open') as opened:
+            engines['django'].get_template('posts/index.html')
+        opened.assert_not_called()
+
+
+class SqlitePragmasTest(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        """Соединение получает PRAGMA из SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            for pragma, expected in (
+                ('busy_timeout', settings.SQLITE_PRAGMAS['busy_timeout']),
+                ('cache_size', settings.SQLITE_PRAGMAS['cache_size']),
+                # NORMAL
+                ('synchronous', 1),
+            ):
+                with self.subTest(pragma=pragma):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    self.assertEqual(cursor.fetchone()[0], expected)
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        routers.start_request(pinned=False)
+
+    def route_read(self):
+        return routers.read_from_replica(
+            lambda: self.router.db_for_read(None))()
+
+    @mock.patch('core.routers.replica_lag', return_value=0)
+    def test_marked_views_read_from_replica(self, lag):
+        self.assertEqual(self.route_read(), 'replica')
+        self.assertIsNone(self.router.db_for_read(None))
+
+    @mock.patch('core.routers.replica_lag', return_value=0)
+    def test_pinned_user_reads_primary(self, lag):
+        routers.start_request(pinned=True)
+        self.assertIsNone(self.route_read())
+
+    def test_lagging_replica_not_used(self):
+        for lag in (settings.REPLICA_MAX_LAG + 1, None):
+            with self.subTest(lag=lag):
+                with mock.patch('core.routers.replica_lag', return_value=lag):
+                    self.assertIsNone(self.route_read())
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(None), 'default')
+        self.assertTrue(routers.wrote_to_primary())
+
+    @mock.patch('core.routers.replica_lag', return_value=None)
+    def test_write_pins_user(self, lag):
+        """После записи пользователь получает метку основной базы."""
+        client = self.client
+        client.force_login(get_user_model().objects.create_user('auth'))
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(
+            response.cookies[PIN_COOKIE]['max-age'],
+            settings.REPLICA_PIN_SECONDS)
+
+    def test_replica_lag_measured_by_probe(self):
+        routers._lag.update(checked=0.0, value=None)
+        with override_settings(REPLICA_DATABASE='default'):
+            self.assertEqual(routers.replica_lag(), 0)
+        routers._lag.update(checked=0.0, value=None)
+        self.assertIsNone(routers.replica_lag())
+
+
+class StampedeCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.compute = mock.Mock(return_value='свежее')
+
+    def expire(self, key, delta=0.0):
+        entry = cache.get(key)
+        entry.update(expires=0, delta=delta)
+        cache.set(key, entry)
+
+    def test_value_cached(self):
+        get_or_recompute('key', self.compute, 60)
+        self.assertEqual(get_or_recompute('key', self.compute, 60), 'свежее')
+        self.compute.assert_called_once()
+
+    def test_stale_value_while_other_process_recomputes(self):
+        """Пока пересчёт заблокирован, отдаётся прежнее значение."""
+        get_or_recompute('key', lambda: 'старое', 60)
+        self.expire('key')
+        cache.add(LOCK_KEY.format('key'), True)
+        self.assertEqual(get_or_recompute('key', self.compute, 60), 'старое')
+        self.compute.assert_not_called()
+
+    def test_expired_value_recomputed_once(self):
+        get_or_recompute('key', lambda: 'старое', 60)
+        self.expire('key')
+        self.assertEqual(get_or_recompute('key', self.compute, 60), 'свежее')
+        self.assertEqual(get_or_recompute('key', self.compute, 60), 'свежее')
+        self.compute.assert_called_once()
+        self.assertIsNone(cache.get(LOCK_KEY.format('key')))
+
+    def test_new_version_is_stale(self):
+        """Запись прежней версии данных пересчитывает один процесс."""
+        get_or_recompute('key', lambda: 'старое', 60, version=1)
+        cache.add(LOCK_KEY.format('key'), True)
+        self.assertEqual(
+            get_or_recompute('key', self.compute, 60, version=2), 'старое')
+        self.compute.assert_not_called()
+        cache.delete(LOCK_KEY.format('key'))
+        self.assertEqual(
+            get_or_recompute('key', self.compute, 60, version=2), 'свежее')
+        self.assertEqual(
+            get_or_recompute('key', self.compute, 60, version=2), 'свежее')
+        self.compute.assert_called_once()
+
+    def test_early_recompute_for_slow_values(self):
+        """Долгий пересчёт начинается до устаревания (XFetch)."""
+        get_or_recompute('key', lambda: 'старое', 60)
+        entry = cache.get('key')
+        entry['delta'] = 120
+        cache.set('key', entry)
+        with mock.patch('core.cache.random.random', return_value=0.9):
+            self.assertEqual(
+                get_or_recompute('key', self.compute, 60), 'свежее')
+
+
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def timing(self, response):
+        """Записи Server-Timing: имя -> параметры."""
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = ';'.join(params)
+        return entries
+
+    @override_settings(SERVER_TIMING_PUBLIC=True)
+    def test_server_timing(self):
+        """Заголовок с БД, шаблонами и кэшем фрагмента главной."""
+        response = self.client.get(reverse('posts:index'))
+        timing = self.timing(response)
+        for name in ('db', 'tpl', 'thumb', 'cache', 'total'):
+            with self.subTest(name=name):
+                self.assertIn(name, timing)
+        self.assertIn('queries', timing['db'])
+        self.assertEqual(timing['cache-index_page'], 'desc="hit 0 miss 1"')
+        repeat = self.timing(self.client.get(reverse('posts:index')))
+        self.assertEqual(repeat['cache-index_page'], 'desc="hit 1 miss 0"')
+
+    def test_server_timing_hidden_from_public(self):
+        """Без DEBUG заголовок видят только сотрудники."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('db', self.timing(response))
+        with override_settings(INTERNAL_IPS=['127.0.0.1']):
+            response = Client().get(reverse('posts:index'))
+        self.assertIn('Server-Timing', response)
+
+    def test_structured_log(self):
+        with self.assertLogs('yatube.performance', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'posts:index')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['db_queries'], 0)
+        self.assertIn('index_page', line['cache'])
+
+    def test_metrics_endpoint(self):
+        """Перцентили по представлениям видны только сотрудникам."""
+        url = reverse('metrics')
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True)
+        self.client.force_login(staff)
+        data = self.client.get(url).json()
+        self.assertEqual(data['posts:index']['count'], 2)
+        self.assertLessEqual(
+            data['posts:index']['p50_ms'], data['posts:index']['p99_ms'])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(metrics._percentile(values, 50), 50)
+        self.assertEqual(metrics._percentile(values, 95), 95)
+        self.assertEqual(metrics._percentile([7], 99), 7)
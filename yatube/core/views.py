@@ -1,7 +1,11 @@
 from http.client import FORBIDDEN, INTERNAL_SERVER_ERROR, NOT_FOUND
 
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
 
+from . import metrics as request_metrics
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию,
@@ -20,3 +24,14 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Перцентили длительностей запросов по представлениям (JSON).
+
+    Доступно сотрудникам и адресам INTERNAL_IPS, остальным — 404.
+    """
+    if not (request.user.is_staff
+            or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS):
+        raise Http404
+    return JsonResponse(request_metrics.snapshot())
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post, Comment, Follow
 
 
@@ -11,6 +12,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо LIKE по search_fields.
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -0,0 +1,245 @@
+"""JSON API только для чтения, версия 1 (/api/v1/).
+
+Данные выбираются через values() без создания объектов моделей
+и отдаются потоком: записи сериализуются по мере чтения из базы.
+Ленты листаются курсором ?after= (поле next ответа), набор полей
+постов задаётся ?fields=id,text,..., размер страницы — ?limit=
+(не больше API_MAX_LIMIT).
+"""
+from functools import wraps
+from itertools import chain
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from core.routers import read_from_replica
+
+from .counters import get_user_counters
+from .models import Comment, Group, Post, TimelineEntry, User
+from .paginators import DIGITS_RE, CursorPaginator
+from .timeline import followed_celebrities
+
+# Имя поля в ответе и путь к нему в values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = ('slug', 'title', 'description')
+PROFILE_FIELDS = ('username', 'first_name', 'last_name')
+COUNTER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+POST_ORDERING = ('-pub_date', '-id')
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+COMMENT_ORDERING = ('created', 'id')
+
+dumps = DjangoJSONEncoder(
+    ensure_ascii=False, separators=(',', ':')).encode
+
+
+class BadRequest(Exception):
+    pass
+
+
+def error_response(detail, status):
+    return JsonResponse(
+        {'detail': detail}, status=status,
+        json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(view):
+    """GET-представление API: ошибки возвращаются в JSON."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return error_response(str(error), 400)
+        except Http404:
+            return error_response('Не найдено', 404)
+    return wrapper
+
+
+class ValuesPaginator(CursorPaginator):
+    """Курсорный пагинатор по словарям values() с заданным порядком."""
+
+    def __init__(self, object_list, per_page, ordering, **kwargs):
+        self.ordering = ordering
+        super().__init__(object_list, per_page, **kwargs)
+
+
+def requested_fields(request, available, prefix=''):
+    """Пары (имя, путь в values()) из ?fields= или все поля."""
+    names = [
+        name.strip()
+        for name in request.GET.get('fields', '').split(',')
+        if name.strip()
+    ]
+    unknown = set(names) - set(available)
+    if unknown:
+        raise BadRequest(
+            'Неизвестные поля: {}. Доступны: {}'.format(
+                ', '.join(sorted(unknown)), ', '.join(available)))
+    return [
+        (name, prefix + available[name])
+        for name in names or available
+    ]
+
+
+def requested_limit(request):
+    raw = request.GET.get('limit')
+    if not raw:
+        return settings.PER_PAGE
+    if (not DIGITS_RE.fullmatch(raw)
+            or not 1 <= int(raw) <= settings.API_MAX_LIMIT):
+        raise BadRequest(
+            f'limit — число от 1 до {settings.API_MAX_LIMIT}')
+    return int(raw)
+
+
+def serialize(row, fields):
+    item = {}
+    for name, lookup in fields:
+        value = row[lookup]
+        if name == 'image':
+            value = default_storage.url(value) if value else None
+        item[name] = value
+    return item
+
+
+def _chunks(rows, fields, paginator, head, key):
+    yield '{' + ''.join(
+        f'{dumps(name)}:{dumps(value)},' for name, value in head.items())
+    yield dumps(key) + ':['
+    last = None
+    has_next = False
+    for count, row in enumerate(rows):
+        if count == paginator.per_page:
+            has_next = True
+            break
+        yield (',' if count else '') + dumps(serialize(row, fields))
+        last = row
+    cursor = paginator.encode_cursor(last) if has_next else None
+    yield '],"next":' + dumps(cursor) + '}'
+
+
+def stream_feed(request, queryset, fields, ordering, head=None,
+                key='results'):
+    """Потоковый ответ со страницей ленты после курсора ?after=."""
+    lookups = {lookup for _, lookup in fields}
+    lookups.update(field.lstrip('-') for field in ordering)
+    paginator = ValuesPaginator(
+        queryset.values(*lookups), requested_limit(request), ordering)
+    rows = paginator.after(request.GET.get('after'))
+    if rows is None:
+        raise BadRequest('Неверный курсор')
+    rows = rows[:paginator.per_page + 1].iterator()
+    # Запрос выполняется здесь, пока действует выбор базы для чтения
+    # (read_from_replica); остальные строки дочитываются при отправке.
+    first = next(rows, None)
+    if first is not None:
+        rows = chain([first], rows)
+    return StreamingHttpResponse(
+        _chunks(rows, fields, paginator, head or {}, key),
+        content_type='application/json')
+
+
+def _values_or_404(queryset, *fields):
+    row = queryset.values(*fields).first()
+    if row is None:
+        raise Http404
+    return row
+
+
+@api_view
+@read_from_replica
+def posts(request):
+    fields = requested_fields(request, POST_FIELDS)
+    return stream_feed(request, Post.objects.all(), fields, POST_ORDERING)
+
+
+@api_view
+@read_from_replica
+def group_posts(request, slug):
+    group = _values_or_404(Group.objects.filter(slug=slug), 'pk',
+                           *GROUP_FIELDS)
+    fields = requested_fields(request, POST_FIELDS)
+    return stream_feed(
+        request, Post.objects.filter(group_id=group.pop('pk')), fields,
+        POST_ORDERING, head={'group': group})
+
+
+@api_view
+@read_from_replica
+def profile(request, username):
+    author = _values_or_404(
+        User.objects.filter(username=username), 'pk', *PROFILE_FIELDS,
+        *[f'counters__{field}' for field in COUNTER_FIELDS])
+    author_id = author.pop('pk')
+    counters = {
+        field: author.pop(f'counters__{field}') for field in COUNTER_FIELDS}
+    if counters['posts_count'] is None:
+        # Строки счётчиков ещё нет: get_user_counters её создаст.
+        actual = get_user_counters(User(pk=author_id))
+        counters = {
+            field: getattr(actual, field) for field in COUNTER_FIELDS}
+    author.update(counters)
+    fields = requested_fields(request, POST_FIELDS)
+    return stream_feed(
+        request, Post.objects.filter(author_id=author_id), fields,
+        POST_ORDERING, head={'author': author})
+
+
+@api_view
+@read_from_replica
+def post_detail(request, post_id):
+    """Пост и страница его активных комментариев."""
+    fields = requested_fields(request, POST_FIELDS)
+    post = _values_or_404(
+        Post.objects.filter(pk=post_id), *{lookup for _, lookup in fields})
+    return stream_feed(
+        request,
+        Comment.objects.filter(post_id=post_id, active=True),
+        list(COMMENT_FIELDS.items()),
+        COMMENT_ORDERING,
+        head={'post': serialize(post, fields)},
+        key='comments',
+    )
+
+
+@api_view
+@read_from_replica
+def follow(request):
+    """Лента подписок текущего пользователя (сессия сайта)."""
+    if not request.user.is_authenticated:
+        return error_response('Требуется вход', 401)
+    user = request.user
+    celebrities = followed_celebrities(user)
+    if celebrities:
+        # Как в follow_page: посты популярных авторов не разложены.
+        queryset = Post.objects.filter(
+            Q(author_id__in=celebrities)
+            | Q(pk__in=TimelineEntry.objects.filter(
+                user=user).values('post_id'))
+        )
+        fields = requested_fields(request, POST_FIELDS)
+        return stream_feed(request, queryset, fields, POST_ORDERING)
+    fields = requested_fields(request, POST_FIELDS, prefix='post__')
+    return stream_feed(
+        request, TimelineEntry.objects.filter(user=user), fields,
+        TIMELINE_ORDERING)
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api_v1'
+
+urlpatterns = [
+    path('posts/', api.posts, name='posts'),
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    path('groups/<slug>/', api.group_posts, name='group_posts'),
+    path('profiles/<str:username>/', api.profile, name='profile'),
+    path('follow/', api.follow, name='follow'),
+]
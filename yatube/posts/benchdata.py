@@ -0,0 +1,380 @@
+"""Генератор данных для бенчмарков и оценки ёмкости (seed_bench_data).
+
+Данные строятся детерминированно по seed: авторы постов, группы,
+комментаторы, обсуждаемые посты и популярные авторы выбираются по
+степенному закону (несколько очень активных, длинный хвост остальных).
+Даты постов распределены по последним days дням, гуще к концу (сайт
+растёт), а комментарии пишутся вскоре после поста; в плане хранится
+возраст в секундах, а даты отсчитываются от момента записи.
+
+Каждая таблица делится на порции по CHUNK_SIZE строк, и у каждой порции
+свой генератор случайных чисел, зависящий только от seed, таблицы
+и номера порции. Поэтому порции генерируются в пуле процессов, а
+результат не зависит от числа процессов. Память не растёт с объёмом:
+в родительском процессе держится записываемая через bulk_create порция,
+не больше PENDING_CHUNKS готовых порций на процесс пула и массивы pk
+пользователей и постов и возраста постов. Счётчики, ленты подписок
+и поисковый индекс после записи пересчитываются целиком.
+"""
+import io
+import math
+import os
+import random
+from array import array
+from collections import deque, namedtuple
+from datetime import timedelta
+from functools import partial
+from multiprocessing import get_context
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import thumbnails
+from .models import Comment, Follow, Group, Post, User
+from .transfer import Progress, original_dates, rebuild_derived
+
+PREFIX = 'bench_'
+CHUNK_SIZE = 5000
+# Сколько порций на процесс пула генерируется впрок, пока родитель пишет.
+PENDING_CHUNKS = 2
+# Показатель степенного закона: больше — сильнее перекос к первым.
+ALPHA = 1.1
+# Доля постов без группы.
+NO_GROUP_SHARE = 0.2
+# Возраст поста — days * u ** POST_AGE_SKEW: больше — гуще к концу.
+POST_AGE_SKEW = 2.0
+# Комментарий — через долю u ** COMMENT_DELAY_SKEW от возраста поста.
+COMMENT_DELAY_SKEW = 4.0
+IMAGE_NAME = 'posts/bench/{}.jpg'
+IMAGE_SIZE = (1600, 1000)
+WORDS = (
+    'город река лес дорога утро вечер зима лето книга письмо друг дом '
+    'окно музыка поезд море горы небо дождь снег работа история время '
+    'свет улица сад кот собака чай кофе ветер солнце новости путешествие '
+    'фотография праздник школа кино театр песня вопрос ответ идея день'
+).split()
+
+Options = namedtuple(
+    'Options',
+    'seed users groups posts comments_per_post follows_per_user '
+    'image_share image_files days')
+Options.__new__.__defaults__ = (0, 100, 10, 1000, 2.0, 10.0, 0.3, 5, 365)
+
+MODELS = {
+    'users': User,
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+
+
+def power_law(rng, size, alpha=ALPHA):
+    """Индекс 0..size-1 с весом примерно 1 / (ранг + 1) ** alpha.
+
+    Обратная функция непрерывного распределения: без таблицы весов,
+    поэтому годится и для миллионов вариантов.
+    """
+    top = (size + 1) ** (1 - alpha)
+    rank = ((top - 1) * rng.random() + 1) ** (1 / (1 - alpha))
+    return min(int(rank) - 1, size - 1)
+
+
+def scatter(rank, size, seed):
+    """Взаимно однозначно переводит ранг в индекс 0..size-1.
+
+    Иначе самыми активными оказались бы первые созданные строки.
+    """
+    step = 7919 + seed % 1000
+    while math.gcd(step, size) != 1:
+        step += 1
+    return (rank * step + seed) % size
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def _rng(options, table, chunk):
+    return random.Random(f'{options.seed}:{table}:{chunk}')
+
+
+def _author(rng, options):
+    return scatter(
+        power_law(rng, options.users), options.users, options.seed)
+
+
+def user_rows(options, chunk, start, stop):
+    rng = _rng(options, 'users', chunk)
+    return [
+        (f'{PREFIX}{i}', rng.choice(WORDS).capitalize(), f'№{i}')
+        for i in range(start, stop)
+    ]
+
+
+def group_rows(options, chunk, start, stop):
+    rng = _rng(options, 'groups', chunk)
+    return [
+        (f'{PREFIX}{i}', f'Группа {i}', _text(rng, 5, 15))
+        for i in range(start, stop)
+    ]
+
+
+def post_rows(options, chunk, start, stop):
+    """(автор, группа или None, текст, картинка или None, возраст, с)."""
+    rng = _rng(options, 'posts', chunk)
+    span = options.days * 24 * 60 * 60
+    rows = []
+    for _ in range(start, stop):
+        group = None
+        if options.groups and rng.random() >= NO_GROUP_SHARE:
+            group = power_law(rng, options.groups)
+        image = None
+        if options.image_files and rng.random() < options.image_share:
+            image = rng.randrange(options.image_files)
+        age = int(span * rng.random() ** POST_AGE_SKEW)
+        rows.append(
+            (_author(rng, options), group, _text(rng, 5, 60), image, age))
+    return rows
+
+
+def comment_rows(options, chunk, start, stop):
+    """(пост, автор, текст, задержка); обсуждаемые посты — по
+    степенному закону, задержка — доля возраста поста."""
+    rng = _rng(options, 'comments', chunk)
+    return [
+        (
+            scatter(power_law(rng, options.posts), options.posts,
+                    options.seed + 1),
+            _author(rng, options),
+            _text(rng, 2, 20),
+            rng.random() ** COMMENT_DELAY_SKEW,
+        )
+        for _ in range(start, stop)
+    ]
+
+
+def follow_rows(options, chunk, start, stop):
+    """(подписчик, автор) для подписчиков start..stop без повторов."""
+    rng = _rng(options, 'follows', chunk)
+    rows = []
+    for user in range(start, stop):
+        authors = set()
+        for _ in range(rng.randint(0, round(2 * options.follows_per_user))):
+            author = _author(rng, options)
+            if author != user:
+                authors.add(author)
+        rows.extend((user, author) for author in sorted(authors))
+    return rows
+
+
+GENERATORS = {
+    'users': user_rows,
+    'groups': group_rows,
+    'posts': post_rows,
+    'comments': comment_rows,
+    'follows': follow_rows,
+}
+
+
+def image_file(options, index):
+    """Картинка-заглушка: свой цвет и подпись; создаётся один раз."""
+    name = IMAGE_NAME.format(index)
+    if default_storage.exists(name):
+        return name
+    rng = _rng(options, 'images', index)
+    image = Image.new(
+        'RGB', IMAGE_SIZE, tuple(rng.randrange(40, 220) for _ in range(3)))
+    ImageDraw.Draw(image).text((40, 40), f'{PREFIX}{index}', fill='white')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def _generate(task):
+    table, options, chunk, start, stop = task
+    return GENERATORS[table](options, chunk, start, stop)
+
+
+def _image(task):
+    return image_file(*task)
+
+
+def sizes(options):
+    """Объём таблиц плана; подписки считаются по подписчикам."""
+    return {
+        'users': options.users,
+        'groups': options.groups,
+        'posts': options.posts if options.users else 0,
+        'comments': round(options.posts * options.comments_per_post)
+        if options.users else 0,
+        'follows': options.users,
+    }
+
+
+def tasks(options, table):
+    total = sizes(options)[table]
+    return [
+        (table, options, chunk, start, min(start + CHUNK_SIZE, total))
+        for chunk, start in enumerate(range(0, total, CHUNK_SIZE))
+    ]
+
+
+def bounded_imap(pool, function, items, limit):
+    """Как pool.imap, но не больше limit незабранных результатов.
+
+    Pool.imap раздаёт все задания сразу, и готовые порции копились бы
+    в памяти, пока родитель медленнее пишет их в базу.
+    """
+    pending = deque()
+    for item in items:
+        ready = pending.popleft() if len(pending) >= limit else None
+        # Новое задание раздаётся до ожидания: пул не простаивает,
+        # пока родитель пишет готовую порцию.
+        pending.append(pool.apply_async(function, (item,)))
+        if ready is not None:
+            yield ready.get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def plan(**options):
+    """Все строки плана в памяти — для небольших наборов и тестов."""
+    options = Options(**options)
+    return {
+        table: [
+            row for task in tasks(options, table) for row in _generate(task)
+        ]
+        for table in GENERATORS
+    }
+
+
+def _pks(queryset):
+    pks = array('q')
+    pks.extend(queryset.order_by('pk').values_list(
+        'pk', flat=True).iterator())
+    return pks
+
+
+class Writer:
+    """Записывает порции плана, переводя индексы плана в pk, а возраст
+    строк — в даты до момента end."""
+
+    def __init__(self, images, report, end=None):
+        self.images = images
+        self.report = report
+        self.end = end or timezone.now()
+        self.user_pks = self.group_pks = self.post_pks = array('q')
+        self.post_ages = array('q')
+        self.first_post = 0
+
+    def users(self, rows):
+        return [
+            User(username=username, first_name=first, last_name=last,
+                 password='!')
+            for username, first, last in rows
+        ]
+
+    def groups(self, rows):
+        return [
+            Group(slug=slug, title=title, description=description)
+            for slug, title, description in rows
+        ]
+
+    def posts(self, rows):
+        self.post_ages.extend(row[-1] for row in rows)
+        return [
+            Post(author_id=self.user_pks[author],
+                 group_id=None if group is None else self.group_pks[group],
+                 text=text,
+                 image='' if image is None else self.images[image],
+                 pub_date=self.end - timedelta(seconds=age))
+            for author, group, text, image, age in rows
+        ]
+
+    def comments(self, rows):
+        return [
+            Comment(post_id=self.post_pks[post],
+                    author_id=self.user_pks[author], text=text,
+                    created=self.end - timedelta(
+                        seconds=self.post_ages[post] * (1 - delay)))
+            for post, author, text, delay in rows
+        ]
+
+    def follows(self, rows):
+        return [
+            Follow(user_id=self.user_pks[user],
+                   author_id=self.user_pks[author])
+            for user, author in rows
+        ]
+
+    def write(self, table, chunks):
+        """Пишет порции таблицы; возвращает число строк."""
+        model = MODELS[table]
+        if table == 'posts':
+            self.first_post = model.objects.order_by('-pk').values_list(
+                'pk', flat=True).first() or 0
+        progress = Progress(table, self.report)
+        with original_dates(model):
+            for rows in chunks:
+                with transaction.atomic():
+                    model.objects.bulk_create(getattr(self, table)(rows))
+                progress.add(len(rows))
+        self.report(progress.line())
+        if table == 'users':
+            self.user_pks = _pks(
+                User.objects.filter(username__startswith=PREFIX))
+        elif table == 'groups':
+            self.group_pks = _pks(
+                Group.objects.filter(slug__startswith=PREFIX))
+        elif table == 'posts':
+            # Строки этого вызова идут подряд: pk совпадают с порядком плана.
+            self.post_pks = _pks(Post.objects.filter(pk__gt=self.first_post))
+        return progress.rows
+
+
+def finish(first_post):
+    """Миниатюры новых постов (pk > first_post) и денормализованные
+    данные, которые bulk_create не обновляет."""
+    posts = Post.objects.filter(pk__gt=first_post).exclude(image='')
+    for post in posts.only('pk', 'image').iterator():
+        thumbnails.enqueue(post)
+    rebuild_derived()
+
+
+def seed(workers=None, report=print, **options):
+    """Создаёт данные бенчмарка; возвращает число строк по таблицам.
+
+    workers — число процессов, генерирующих порции (по умолчанию —
+    число ядер); при workers=1 всё делается в текущем процессе.
+    """
+    options = Options(**options)
+    if User.objects.filter(username__startswith=PREFIX).exists():
+        raise ValueError('Данные бенчмарка уже созданы')
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if workers > 1:
+        # Дочерние процессы не обращаются к базе, но унаследованные
+        # соединения лучше закрыть до fork.
+        connections.close_all()
+        pool = get_context('fork').Pool(workers)
+    imap = map
+    if pool:
+        imap = partial(bounded_imap, pool, limit=PENDING_CHUNKS * workers)
+    try:
+        images = list(imap(
+            _image, [(options, i) for i in range(options.image_files)]))
+        writer = Writer(images, report)
+        created = {
+            table: writer.write(table, imap(_generate, tasks(options, table)))
+            for table in GENERATORS
+        }
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    finish(writer.first_post)
+    return created
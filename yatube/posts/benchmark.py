@@ -0,0 +1,287 @@
+"""Нагрузочные сценарии для адресов posts/urls.py (manage.py bench).
+
+Каждый сценарий — один адрес с реальными объектами из базы (самый
+активный автор, самая большая группа, самый обсуждаемый пост и т. п.).
+Запросы выполняются тестовым клиентом Django внутри процесса или по
+HTTP: к локальному WSGI-серверу, который команда поднимает сама, или к
+уже запущенному серверу. Число SQL-запросов берётся из заголовка
+Server-Timing (core.middleware.PerformanceMiddleware); запущенный сервер
+отдаёт его при SERVER_TIMING_PUBLIC или адресу из INTERNAL_IPS. Результаты
+пишутся в JSON, который можно сравнить с результатами другого коммита.
+"""
+import re
+import statistics
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db.models import Count
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, User
+from .views import comments_page
+
+Scenario = namedtuple('Scenario', 'name method url data user')
+
+QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+# Метрика и направление улучшения: 1 — больше лучше, -1 — меньше.
+METRICS = {'rps': 1, 'p50_ms': -1, 'p99_ms': -1, 'queries': -1}
+
+
+def _sample(queryset):
+    obj = queryset.first()
+    if obj is None:
+        raise ValueError('В базе нет данных: запустите seed_bench_data')
+    return obj
+
+
+def scenarios():
+    """Сценарии для всех адресов posts/urls.py по данным базы."""
+    author = _sample(User.objects.annotate(
+        total=Count('posts')).order_by('-total', 'pk'))
+    reader = _sample(User.objects.annotate(
+        total=Count('follower')).order_by('-total', 'pk'))
+    group = _sample(Group.objects.annotate(
+        total=Count('posts')).order_by('-total', 'pk'))
+    post = _sample(Post.objects.order_by('-comments_count', '-pk'))
+    own_post = _sample(Post.objects.filter(author=author))
+    target = _sample(User.objects.exclude(pk=reader.pk).order_by('pk'))
+    word = post.text.split()[0]
+    comments_cursor = comments_page(post.pk).next_cursor
+    middle_page = max(1, Post.objects.count() // settings.PER_PAGE // 2)
+
+    def get(name, url_name, user=None, query='', **kwargs):
+        url = reverse(f'posts:{url_name}', kwargs=kwargs) + query
+        return Scenario(name, 'GET', url, None, user)
+
+    return [
+        get('index', 'index'),
+        get('index_middle_page', 'index', query=f'?page={middle_page}'),
+        get('group_posts', 'group_posts', slug=group.slug),
+        get('profile', 'profile', username=author.username),
+        get('post_detail', 'post_detail', post_id=post.pk),
+        get('post_comments', 'post_comments', post_id=post.pk,
+            query=f'?after={comments_cursor}' if comments_cursor else ''),
+        get('post_create', 'post_create', user=author),
+        get('post_edit', 'post_edit', user=author, post_id=own_post.pk),
+        Scenario(
+            'add_comment', 'POST',
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий бенчмарка'}, reader),
+        get('search', 'search', query=f'?q={word}'),
+        get('follow_index', 'follow_index', user=reader),
+        get('profile_follow', 'profile_follow', user=reader,
+            username=target.username),
+        get('profile_unfollow', 'profile_unfollow', user=reader,
+            username=target.username),
+        get('rss', 'rss'),
+        get('atom', 'atom'),
+        get('group_rss', 'group_rss', slug=group.slug),
+        get('group_atom', 'group_atom', slug=group.slug),
+        get('profile_rss', 'profile_rss', username=author.username),
+        get('profile_atom', 'profile_atom', username=author.username),
+    ]
+
+
+def _queries(server_timing):
+    match = QUERIES_RE.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+class ClientTransport:
+    """Запросы тестовым клиентом Django внутри процесса."""
+    concurrent = False
+
+    def __init__(self):
+        self.clients = {}
+
+    def client(self, user):
+        key = user.pk if user else None
+        if key not in self.clients:
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            self.clients[key] = client
+        return self.clients[key]
+
+    def request(self, scenario):
+        client = self.client(scenario.user)
+        if scenario.method == 'POST':
+            response = client.post(scenario.url, scenario.data)
+        else:
+            response = client.get(scenario.url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code, response.get('Server-Timing')
+
+
+class HttpTransport:
+    """Запросы по HTTP к серверу base_url; сессии — свои у потока."""
+    concurrent = True
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = {}
+        self.local = threading.local()
+
+    def _cookies(self, user):
+        # Сессия создаётся в общей базе, а токен CSRF — свой: сервер
+        # сверяет только куку и заголовок между собой.
+        key = user.pk if user else None
+        if key not in self.cookies:
+            cookies = {}
+            if user is not None:
+                client = Client()
+                client.force_login(user)
+                name = settings.SESSION_COOKIE_NAME
+                cookies[name] = client.cookies[name].value
+            request = HttpRequest()
+            token = get_token(request)
+            cookies[settings.CSRF_COOKIE_NAME] = request.META['CSRF_COOKIE']
+            self.cookies[key] = (cookies, token)
+        return self.cookies[key]
+
+    def session(self, user):
+        sessions = getattr(self.local, 'sessions', None)
+        if sessions is None:
+            sessions = self.local.sessions = {}
+        key = user.pk if user else None
+        if key not in sessions:
+            session = requests.Session()
+            cookies, token = self._cookies(user)
+            session.cookies.update(cookies)
+            session.headers['X-CSRFToken'] = token
+            sessions[key] = session
+        return sessions[key]
+
+    def request(self, scenario):
+        response = self.session(scenario.user).request(
+            scenario.method, self.base_url + scenario.url,
+            data=scenario.data, allow_redirects=False)
+        return response.status_code, response.headers.get('Server-Timing')
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # Иначе заголовки и тело уходят отдельными пакетами и каждый ответ
+    # ждёт отложенного ACK клиента (~40 мс).
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def local_server():
+    """WSGI-сервер приложения на свободном порту в фоновом потоке."""
+    server = ThreadedWSGIServer(
+        ('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _percentile(values, percent):
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+def run_scenario(transport, scenario, requests_count, concurrency=1,
+                 warmup=3):
+    """Метрики сценария: запросов в секунду, p50/p99 и SQL на запрос."""
+    for _ in range(warmup):
+        transport.request(scenario)
+
+    def timed_request(_):
+        started = time.perf_counter()
+        status, server_timing = transport.request(scenario)
+        return time.perf_counter() - started, status, server_timing
+
+    started = time.perf_counter()
+    if transport.concurrent and concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(timed_request, range(requests_count)))
+    else:
+        # Тестовый клиент работает с соединением к базе этого потока.
+        results = [timed_request(i) for i in range(requests_count)]
+    elapsed = time.perf_counter() - started
+    latencies = [seconds * 1000 for seconds, _, _ in results]
+    queries = [_queries(timing) for _, _, timing in results]
+    queries = [count for count in queries if count is not None]
+    return {
+        'url': scenario.url,
+        'method': scenario.method,
+        'requests': requests_count,
+        'errors': sum(1 for _, status, _ in results if status >= 400),
+        'rps': round(requests_count / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 50), 2),
+        'p99_ms': round(_percentile(latencies, 99), 2),
+        'queries': round(statistics.mean(queries), 1) if queries else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def data_size():
+    return {
+        'users': User.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def metadata(mode, requests_count, concurrency):
+    return {
+        'revision': git_revision(),
+        'date': timezone.now().isoformat(timespec='seconds'),
+        'mode': mode,
+        'requests': requests_count,
+        'concurrency': concurrency,
+        'data': data_size(),
+    }
+
+
+def compare(base, new, tolerance=10.0):
+    """Строки сравнения двух файлов результатов.
+
+    Каждая строка: (сценарий, метрика, было, стало, изменение в %,
+    регрессия ли — ухудшение больше tolerance процентов).
+    """
+    rows = []
+    for name, result in new['scenarios'].items():
+        previous = base['scenarios'].get(name)
+        if previous is None:
+            continue
+        for metric, direction in METRICS.items():
+            old, value = previous.get(metric), result.get(metric)
+            if not old or value is None:
+                continue
+            change = (value - old) / old * 100
+            rows.append((
+                name, metric, old, value, round(change, 1),
+                -change * direction > tolerance))
+    return rows
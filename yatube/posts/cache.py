@@ -0,0 +1,80 @@
+"""Поколения данных для кэша фрагментов.
+
+Каждая область данных (все посты, группа, автор, пост) имеет счётчик
+поколения в кэше. Сохранение или удаление объекта увеличивает счётчики
+затронутых областей. Карточки постов включают поколения в ключ, а
+фрагменты лент хранят их в записи (версия core.cache.get_or_recompute):
+запись прежнего поколения пересобирается сразу при любом сроке жизни
+кэша, но одним процессом, пока остальные отдают прежнюю.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = 'generation:{}'
+# Число записей ленты области для номеров страниц.
+COUNT_KEY = 'count:{}'
+
+
+def _initial_generation():
+    # Начальное значение растёт со временем: если счётчик вытеснили
+    # из кэша, старые фрагменты не совпадут с новым поколением.
+    return int(time.time() * 1000)
+
+
+def generation_values(names):
+    """Текущие поколения областей names одним запросом к кэшу."""
+    keys = {name: GENERATION_KEY.format(name) for name in names}
+    values = cache.get_many(list(keys.values()))
+    result = {}
+    for name, key in keys.items():
+        if key not in values:
+            cache.add(key, _initial_generation(), timeout=None)
+            values[key] = cache.get(key)
+        result[name] = values[key]
+    return result
+
+
+def generations(*names):
+    """Строка с текущими поколениями областей names для ключа фрагмента."""
+    values = generation_values(names)
+    return '.'.join(str(values[name]) for name in names)
+
+
+def _bump(names):
+    for name in names:
+        key = GENERATION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), timeout=None)
+
+
+def bump(*names):
+    """Сбрасывает фрагменты областей names.
+
+    Счётчики увеличиваются сразу и ещё раз после фиксации транзакции,
+    чтобы фрагмент, собранный по незафиксированным данным, не остался
+    в кэше под новым поколением.
+    """
+    _bump(names)
+    transaction.on_commit(lambda: _bump(names))
+
+
+def invalidate_counts(*names):
+    """Сбрасывает кэшированное число записей лент областей names."""
+    keys = [COUNT_KEY.format(name) for name in names]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def post_scopes(post):
+    """Области кэша, в которых выводится пост."""
+    groups = {post.group_id, getattr(post, 'loaded_group_id', None)}
+    return [
+        'posts',
+        f'author:{post.author_id}',
+        f'post:{post.pk}',
+        *[f'group:{group_id}' for group_id in groups if group_id],
+    ]
@@ -0,0 +1,125 @@
+"""Приём комментариев через очередь и запись пачками.
+
+При ASYNC_COMMENTS представление add_comment не пишет в базу: проверенная
+форма становится заданием файловой очереди (core.queue), а обработчик
+(manage.py comment_worker) забирает до COMMENT_BATCH_SIZE заданий
+и сохраняет их одним bulk_create. Счётчик комментариев поста и поколение
+его кэша меняются один раз на пачку, поэтому всплеск комментариев под
+одним постом не выстраивается в очередь за блокировкой записи SQLite.
+
+Пока комментарий в очереди, автор видит его на странице поста: имена
+заданий хранятся в сессии автора и отбрасываются, когда задание
+выполнено. Кэш для этого не годится: LocMemCache у каждого процесса свой,
+и следующий запрос, попавший в другой процесс, не увидел бы комментарий.
+Сессия стоит одного UPDATE на комментарий, зато видна в любом процессе.
+"""
+import logging
+import os
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from core.queue import FileQueue
+
+from . import counters
+from .cache import bump
+from .models import Comment, Post, User
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'pending_comments'
+# Сколько автор видит комментарий, если обработчик его так и не записал.
+PENDING_TIMEOUT = 60 * 60
+
+
+def get_queue():
+    return FileQueue(os.path.join(settings.QUEUE_ROOT, 'comments'))
+
+
+def submit(request, post_id, text):
+    """Ставит комментарий в очередь и запоминает его для автора."""
+    name = get_queue().put({
+        'post_id': post_id,
+        'author_id': request.user.pk,
+        'text': text,
+    })
+    entries = request.session.get(PENDING_KEY, [])
+    request.session[PENDING_KEY] = entries + [
+        [name, post_id, text, time.time()]]
+
+
+def pending(request, post_id):
+    """Ещё не записанные комментарии пользователя к посту post_id."""
+    if not request.user.is_authenticated:
+        return []
+    entries = request.session.get(PENDING_KEY)
+    if not entries:
+        return []
+    queue = get_queue()
+    expired = time.time() - PENDING_TIMEOUT
+    waiting = [
+        entry for entry in entries
+        if entry[3] > expired and entry[0] in queue
+    ]
+    if not waiting:
+        del request.session[PENDING_KEY]
+    elif len(waiting) != len(entries):
+        request.session[PENDING_KEY] = waiting
+    return [
+        {'name': name, 'author': request.user, 'text': text}
+        for name, entry_post_id, text, _ in waiting
+        if entry_post_id == post_id
+    ]
+
+
+def write(jobs):
+    """Сохраняет комментарии заданий; возвращает число записанных.
+
+    Задания к удалённым постам и от удалённых авторов отбрасываются.
+    """
+    payloads = [job.payload for job in jobs]
+    post_ids = {payload['post_id'] for payload in payloads}
+    author_ids = {payload['author_id'] for payload in payloads}
+    posts = set(Post.objects.filter(pk__in=post_ids).order_by().values_list(
+        'pk', flat=True))
+    authors = set(User.objects.filter(pk__in=author_ids).values_list(
+        'pk', flat=True))
+    comments = [
+        Comment(post_id=payload['post_id'], author_id=payload['author_id'],
+                text=payload['text'])
+        for payload in payloads
+        if payload['post_id'] in posts and payload['author_id'] in authors
+    ]
+    added = Counter(comment.post_id for comment in comments)
+    with transaction.atomic():
+        # bulk_create не отправляет post_save: счётчики — по посту на пачку.
+        Comment.objects.bulk_create(comments)
+        for post_id, count in added.items():
+            counters.bump_comments(post_id, count)
+    if added:
+        bump(*(f'post:{post_id}' for post_id in added))
+    return len(comments)
+
+
+def process_queue(batch_size=None):
+    """Записывает все комментарии из очереди; возвращает число заданий."""
+    queue = get_queue()
+    batch_size = batch_size or settings.COMMENT_BATCH_SIZE
+    processed = 0
+    while True:
+        jobs = queue.claim(batch_size)
+        if not jobs:
+            return processed
+        try:
+            written = write(jobs)
+        except DatabaseError:
+            # Пачка целиком вернётся в очередь и запишется позже.
+            for job in jobs:
+                queue.release(job)
+            raise
+        for job in jobs:
+            queue.ack(job)
+        processed += len(jobs)
+        logger.info('Записано комментариев: %s из %s', written, len(jobs))
@@ -0,0 +1,77 @@
+"""Условные GET-запросы (ETag) для лент и страницы поста.
+
+ETag собирается из счётчиков поколений областей, которые выводит
+страница (posts.cache), пользователя и адреса с параметрами страницы.
+Он считается по кэшу до выборки ленты, поэтому повторный запрос без
+изменений получает 304 без рендеринга шаблона.
+
+Last-Modified не отдаётся: время свежего поста не меняется при правках,
+удалениях и подписках, и клиент, который присылает только
+If-Modified-Since, получал бы 304 на устаревшую страницу.
+"""
+import hashlib
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from .cache import generations
+from .comments import pending
+from .models import Group, Post, User
+
+
+def page_etag(request, *names):
+    """ETag страницы, которая выводит области names."""
+    # Страницы персональны: имя в шапке, кнопки подписки и правки.
+    user = request.user.pk if request.user.is_authenticated else ''
+    parts = [
+        str(settings.PAGE_ETAG_VERSION),
+        request.get_full_path(),
+        str(user),
+        generations(*names),
+    ]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def index_etag(request):
+    return page_etag(request, 'posts', 'users', 'groups')
+
+
+def group_etag(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    if group_id is None:
+        return None
+    return page_etag(request, f'group:{group_id}', 'users')
+
+
+def profile_etag(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    return page_etag(
+        request, f'author:{author_id}', f'follows:{author_id}', 'groups')
+
+
+def post_etag(request, post_id):
+    author_id = Post.objects.filter(
+        pk=post_id).values_list('author_id', flat=True).first()
+    if author_id is None:
+        return None
+    # Автор нужен из-за его счётчика постов на странице, группы — из-за
+    # названия группы поста.
+    etag = page_etag(
+        request, f'post:{post_id}', f'author:{author_id}', 'users',
+        'groups')
+    waiting = pending(request, post_id)
+    if waiting:
+        # Комментарии из очереди видны автору, но не меняют поколений.
+        names = '|'.join(comment['name'] for comment in waiting)
+        etag = hashlib.md5(f'{etag}|{names}'.encode()).hexdigest()
+    return etag
+
+
+index_condition = condition(etag_func=index_etag)
+group_condition = condition(etag_func=group_etag)
+profile_condition = condition(etag_func=profile_etag)
+post_condition = condition(etag_func=post_etag)
@@ -0,0 +1,180 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются инкрементально в обработчиках сигналов (posts.signals),
+а `repair_counters` пересчитывает их целиком, если они разошлись
+с данными (например, после bulk_create или правки базы вручную).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+
+def _count(queryset, field):
+    """Подзапрос COUNT(*) по строкам queryset, сгруппированным по field."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(field).annotate(
+                total=Count('pk')).values('total')
+        ),
+        Value(0)
+    )
+
+
+def user_count_expressions():
+    """Точные значения счётчиков пользователя через подзапросы."""
+    return {
+        'posts_count': _count(
+            Post.objects.filter(author=OuterRef('pk')), 'author'),
+        'followers_count': _count(
+            Follow.objects.filter(author=OuterRef('pk')), 'author'),
+        'following_count': _count(
+            Follow.objects.filter(user=OuterRef('pk')), 'user'),
+    }
+
+
+def comments_count_expression():
+    return _count(
+        Comment.objects.filter(post=OuterRef('pk'), active=True), 'post')
+
+
+def _create_user_counters(user_id):
+    actual = User.objects.filter(pk=user_id).annotate(
+        **user_count_expressions()).values(
+            'posts_count', 'followers_count', 'following_count').first()
+    if actual is None:
+        return None
+    try:
+        with transaction.atomic():
+            return UserCounters.objects.create(user_id=user_id, **actual)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        return UserCounters.objects.get(user_id=user_id)
+
+
+def bump_user(user_id, **deltas):
+    """Прибавляет deltas к счётчикам пользователя.
+
+    Если строки счётчиков ещё нет, она создаётся с точными значениями,
+    которые уже учитывают текущее изменение.
+    """
+    changes = {
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+    updated = UserCounters.objects.filter(user_id=user_id).update(**changes)
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        _create_user_counters(user_id)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0))
+
+
+def recount_comments(post_id):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=comments_count_expression())
+
+
+def recount(user_ids=(), post_ids=()):
+    """Точные счётчики указанных пользователей и постов.
+
+    В отличие от repair_counters пересчитываются только эти строки:
+    так после bulk_create порции не приходится обходить всю базу.
+    """
+    if user_ids:
+        missing = User.objects.filter(
+            pk__in=user_ids, counters__isnull=True).values_list(
+                'pk', flat=True)
+        UserCounters.objects.bulk_create(
+            [UserCounters(user_id=user_id) for user_id in missing],
+            ignore_conflicts=True
+        )
+        UserCounters.objects.filter(pk__in=user_ids).update(
+            **user_count_expressions())
+    if post_ids:
+        Post.objects.filter(pk__in=post_ids).update(
+            comments_count=comments_count_expression())
+
+
+def get_user_counters(user):
+    """Счётчики пользователя; при отсутствии строки считает их."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        counters = _create_user_counters(user.pk)
+        user.counters = counters
+        return counters
+
+
+def _drifted_ids(queryset, expressions):
+    """Первичные ключи строк, где счётчики разошлись с данными."""
+    annotations = {}
+    drift = Q()
+    for field, expression in expressions.items():
+        annotations[f'actual_{field}'] = expression
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    return list(
+        queryset.annotate(**annotations).filter(drift).values_list(
+            'pk', flat=True)
+    )
+
+
+def _repair(queryset, expressions, batch_size, dry_run):
+    """Пересчитывает счётчики пачками по диапазонам первичного ключа."""
+    drifted = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return drifted
+        ids = _drifted_ids(
+            queryset.filter(pk__gt=last_pk, pk__lte=batch[-1]), expressions)
+        last_pk = batch[-1]
+        drifted += len(ids)
+        if ids and not dry_run:
+            with transaction.atomic():
+                queryset.filter(pk__in=ids).update(**expressions)
+
+
+def _create_missing(batch_size, dry_run):
+    missing = User.objects.filter(counters__isnull=True)
+    if dry_run:
+        return missing.count()
+    expressions = user_count_expressions()
+    created = 0
+    while True:
+        rows = list(
+            missing.annotate(**expressions).order_by('pk').values(
+                'pk', *expressions)[:batch_size]
+        )
+        if not rows:
+            return created
+        UserCounters.objects.bulk_create(
+            [UserCounters(user_id=row.pop('pk'), **row) for row in rows],
+            ignore_conflicts=True
+        )
+        created += len(rows)
+
+
+def repair_counters(batch_size=1000, dry_run=False):
+    """Приводит все счётчики в соответствие с данными.
+
+    Возвращает число созданных строк счётчиков и число исправленных
+    строк пользователей и постов.
+    """
+    return {
+        'created': _create_missing(batch_size, dry_run),
+        'users': _repair(
+            UserCounters.objects.all(), user_count_expressions(),
+            batch_size, dry_run),
+        'posts': _repair(
+            Post.objects.all(),
+            {'comments_count': comments_count_expression()},
+            batch_size, dry_run),
+    }
@@ -0,0 +1,180 @@
+"""Ленты RSS и Atom для всего сайта, групп и авторов.
+
+Готовый XML хранится в кэше вместе с поколениями областей ленты
+(posts.cache), поэтому пересобирается, только когда в области создают
+или правят пост. ETag и Last-Modified берутся из закэшированной записи:
+опрос без изменений получает 304 без запросов к лентам. Last-Modified —
+время сборки записи, а не дата свежего поста: правка поста не меняет
+pub_date, но даёт новую запись.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+
+from core.cache import get_or_recompute
+from core.routers import read_from_replica
+
+from .cache import generations
+from .models import Group, Post, User
+
+FEED_KEY = 'feed:{}'
+# Число постов в ленте и длина заголовка записи.
+FEED_ITEMS = 20
+TITLE_LENGTH = 60
+
+
+class LatestPostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи на Yatube'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.for_feed()
+
+    def items(self, obj):
+        return self.posts(obj)[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(TITLE_LENGTH)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_posts', kwargs={'slug': obj.slug})
+
+    def posts(self, obj):
+        return Post.objects.for_group(obj)
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: записи {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return self.title(obj)
+
+    def link(self, obj):
+        return reverse('posts:profile', kwargs={'username': obj.username})
+
+    def posts(self, obj):
+        return Post.objects.for_author(obj)
+
+
+class AtomLatestPostsFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class AtomGroupPostsFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupPostsFeed.description
+
+
+class AtomAuthorPostsFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorPostsFeed.description
+
+
+def site_scopes():
+    return ['posts', 'users', 'groups']
+
+
+def group_scopes(slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    if group_id is None:
+        return None
+    return [f'group:{group_id}', 'users']
+
+
+def author_scopes(username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    return [f'author:{author_id}', 'groups']
+
+
+def render_feed(feed, request, kwargs):
+    response = feed(request, **kwargs)
+    return {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': hashlib.md5(response.content).hexdigest(),
+        'last_modified': int(time.time()),
+    }
+
+
+def cached_feed(feed_class, scopes):
+    """Представление ленты feed_class из кэша с условным GET.
+
+    scopes(**kwargs) — области кэша ленты или None, если объекта нет.
+    """
+    feed = feed_class()
+
+    @read_from_replica
+    def view(request, **kwargs):
+        names = scopes(**kwargs)
+        if names is None:
+            raise Http404
+        # Ссылки в ленте абсолютные: ключ зависит от домена.
+        url = hashlib.md5(
+            request.build_absolute_uri(request.path).encode()).hexdigest()
+        entry = get_or_recompute(
+            FEED_KEY.format(url), lambda: render_feed(feed, request, kwargs),
+            settings.FEED_CACHE_TIMEOUT, name='syndication',
+            version=generations(*names))
+        response = HttpResponse(
+            entry['content'], content_type=entry['content_type'])
+        response['ETag'] = quote_etag(entry['etag'])
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        return get_conditional_response(
+            request, etag=response['ETag'],
+            last_modified=entry['last_modified'], response=response)
+    return view
+
+
+site_rss = cached_feed(LatestPostsFeed, site_scopes)
+site_atom = cached_feed(AtomLatestPostsFeed, site_scopes)
+group_rss = cached_feed(GroupPostsFeed, group_scopes)
+group_atom = cached_feed(AtomGroupPostsFeed, group_scopes)
+author_rss = cached_feed(AuthorPostsFeed, author_scopes)
+author_atom = cached_feed(AtomAuthorPostsFeed, author_scopes)
@@ -0,0 +1,112 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from posts.benchmark import (ClientTransport, HttpTransport, compare,
+                             local_server, metadata, run_scenario,
+                             scenarios)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочные сценарии для адресов posts/urls.py: запросов '
+            'в секунду, задержки p50/p99 и SQL-запросов на запрос')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', choices=('client', 'wsgi'), default='client',
+            help='client — тестовый клиент Django, wsgi — локальный '
+                 'WSGI-сервер по HTTP')
+        parser.add_argument(
+            '--url', help='Адрес уже запущенного сервера вместо локального')
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Параллельных запросов (только по HTTP)')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--scenario', action='append',
+            help='Запустить только эти сценарии')
+        parser.add_argument('--output', help='Файл JSON для результатов')
+        parser.add_argument(
+            '--compare', nargs='+', metavar='FILE',
+            help='Сравнить с результатами FILE; два файла — сравнить '
+                 'их между собой без запуска')
+        parser.add_argument(
+            '--tolerance', type=float, default=10.0,
+            help='Ухудшение, %%, которое считается регрессией')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой при регрессиях')
+
+    def handle(self, *args, **options):
+        compare_with = options['compare'] or []
+        if len(compare_with) > 2:
+            raise CommandError('--compare принимает один или два файла')
+        if len(compare_with) == 2:
+            self.report(load(compare_with[0]), load(compare_with[1]), options)
+            return
+        results = self.run(options)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+                file.write('\n')
+        if compare_with:
+            self.report(load(compare_with[0]), results, options)
+
+    def run(self, options):
+        try:
+            selected = scenarios()
+        except ValueError as error:
+            raise CommandError(error)
+        if options['scenario']:
+            selected = [
+                scenario for scenario in selected
+                if scenario.name in options['scenario']
+            ]
+        mode = 'http' if options['url'] else options['mode']
+        results = metadata(mode, options['requests'], options['concurrency'])
+        results['scenarios'] = {}
+        if options['url']:
+            # Внешний сервер отдаёт Server-Timing, только если так
+            # настроен (SERVER_TIMING_PUBLIC или INTERNAL_IPS).
+            self.run_all(
+                HttpTransport(options['url']), selected, results, options)
+            return results
+        with override_settings(SERVER_TIMING_PUBLIC=True):
+            if mode == 'client':
+                self.run_all(ClientTransport(), selected, results, options)
+            else:
+                with local_server() as url:
+                    self.run_all(
+                        HttpTransport(url), selected, results, options)
+        return results
+
+    def run_all(self, transport, selected, results, options):
+        for scenario in selected:
+            result = run_scenario(
+                transport, scenario, options['requests'],
+                options['concurrency'], options['warmup'])
+            results['scenarios'][scenario.name] = result
+            self.stdout.write(
+                f'{scenario.name:<20} {result["rps"]:>8} запр./с  '
+                f'p50 {result["p50_ms"]:>8} мс  p99 {result["p99_ms"]:>8} мс  '
+                f'SQL {result["queries"]}  ошибок {result["errors"]}')
+
+    def report(self, base, new, options):
+        regressions = 0
+        for name, metric, old, value, change, regression in compare(
+                base, new, options['tolerance']):
+            mark = '  РЕГРЕССИЯ' if regression else ''
+            regressions += regression
+            self.stdout.write(
+                f'{name:<20} {metric:<8} {old:>10} -> {value:<10} '
+                f'{change:+.1f}%{mark}')
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Регрессий: {regressions}')
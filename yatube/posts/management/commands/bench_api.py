@@ -0,0 +1,82 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+
+def fetch(client, url):
+    """Запрашивает url и возвращает размер ответа в байтах."""
+    response = client.get(url)
+    if response.status_code != 200:
+        raise CommandError(f'{url}: ответ {response.status_code}')
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность HTML-страниц лент '
+            'и JSON API для тех же данных (запросы внутри процесса)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом')
+
+    def pairs(self):
+        """Пары (название, адрес HTML, адрес API) по данным базы."""
+        post = Post.objects.order_by('-pub_date').first()
+        if post is None:
+            raise CommandError('В базе нет постов')
+        pairs = [
+            ('главная', reverse('posts:index'), reverse('api_v1:posts')),
+            ('профиль',
+             reverse('posts:profile', args=[post.author.username]),
+             reverse('api_v1:profile', args=[post.author.username])),
+            ('пост',
+             reverse('posts:post_detail', args=[post.pk]),
+             reverse('api_v1:post_detail', args=[post.pk])),
+        ]
+        group = Group.objects.filter(posts__isnull=False).first()
+        if group is not None:
+            pairs.append((
+                'группа',
+                reverse('posts:group_posts', args=[group.slug]),
+                reverse('api_v1:group_posts', args=[group.slug])))
+        return pairs
+
+    def handle(self, *args, **options):
+        client = Client()
+        pairs = self.pairs()
+        follow = Follow.objects.select_related('user').first()
+        if follow is not None:
+            client.force_login(follow.user)
+            pairs.append((
+                'подписки', reverse('posts:follow_index'),
+                reverse('api_v1:follow')))
+        for name, html_url, api_url in pairs:
+            results = [
+                self.run(client, url, options)
+                for url in (html_url, api_url)
+            ]
+            (html_rate, html_size), (api_rate, api_size) = results
+            self.stdout.write(
+                f'{name}: HTML {html_rate:.0f} запр./с, {html_size} байт; '
+                f'API {api_rate:.0f} запр./с, {api_size} байт; '
+                f'API быстрее в {api_rate / html_rate:.1f} раза')
+
+    def run(self, client, url, options):
+        # Прогрев: соединение, шаблоны и, без --cold, кэш фрагментов.
+        size = fetch(client, url)
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            fetch(client, url)
+        elapsed = time.perf_counter() - started
+        return options['requests'] / elapsed, size
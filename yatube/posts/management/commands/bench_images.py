@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts.models import Post, Thumbnail
+from posts.paginators import CursorPaginator
+from posts.thumbnails import FALLBACK_FORMAT
+
+
+def _size(name):
+    try:
+        return default_storage.size(name)
+    except OSError:
+        return 0
+
+
+def choose(variants, needed_width, accepted):
+    """Вариант, который выберет браузер по <picture> и srcset.
+
+    Первый поддерживаемый формат, наименьшая ширина не меньше нужной
+    (или самая большая, если все меньше).
+    """
+    for image_format in accepted:
+        candidates = sorted(
+            (thumb for thumb in variants if thumb.format == image_format),
+            key=lambda thumb: thumb.width
+        )
+        for thumb in candidates:
+            if thumb.width >= needed_width:
+                return thumb
+        if candidates:
+            return candidates[-1]
+    return None
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает объём картинок на страницах главной ленты: '
+            'JPEG 1000px и адаптивные варианты <picture>')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=5,
+            help='Сколько первых страниц ленты учитывать')
+        parser.add_argument(
+            '--viewport', type=int, action='append',
+            help='Ширина экрана в CSS-пикселях (можно несколько раз)')
+        parser.add_argument(
+            '--dpr', type=float, default=1.0,
+            help='Плотность пикселей экрана')
+        parser.add_argument(
+            '--accept', default=','.join(settings.POST_IMAGE_FORMATS),
+            help='Форматы, которые понимает браузер, по предпочтению')
+
+    def handle(self, *args, **options):
+        viewports = options['viewport'] or [375, 1280]
+        accepted = options['accept'].split(',')
+        largest = str(max(settings.POST_IMAGE_WIDTHS))
+        widths = {str(width) for width in settings.POST_IMAGE_WIDTHS}
+        paginator = CursorPaginator(
+            Post.objects.for_feed(), settings.PER_PAGE)
+        page = paginator.cursor_page()
+        pages = 0
+        posts = []
+        while pages < options['pages']:
+            posts.extend(post for post in page if post.image)
+            pages += 1
+            if not page.next_cursor:
+                break
+            page = paginator.cursor_page(after=page.next_cursor)
+        if not pages:
+            self.stdout.write('Лента пуста')
+            return
+        variants = {post.pk: [] for post in posts}
+        sources = {post.pk: post.image.name for post in posts}
+        for thumb in Thumbnail.objects.filter(
+                post_id__in=list(sources), geometry__in=widths):
+            if sources[thumb.post_id] == thumb.source:
+                variants[thumb.post_id].append(thumb)
+        totals = {'original': 0, 'jpeg': 0}
+        totals.update({viewport: 0 for viewport in viewports})
+        for post in posts:
+            totals['original'] += _size(post.image.name)
+            fallback = choose(
+                [thumb for thumb in variants[post.pk]
+                 if thumb.geometry == largest],
+                0, [FALLBACK_FORMAT])
+            totals['jpeg'] += _size(
+                fallback.image.name if fallback else post.image.name)
+            for viewport in viewports:
+                needed = min(viewport, int(largest)) * options['dpr']
+                thumb = choose(variants[post.pk], needed, accepted)
+                totals[viewport] += _size(
+                    thumb.image.name if thumb else post.image.name)
+        self.stdout.write(
+            f'Страниц: {pages}, картинок: {len(posts)}, '
+            f'форматы: {",".join(accepted)}, dpr: {options["dpr"]}')
+        rows = [('оригиналы', totals['original']),
+                (f'JPEG {largest}px', totals['jpeg'])]
+        rows += [(f'<picture>, экран {viewport}px', totals[viewport])
+                 for viewport in viewports]
+        for title, total in rows:
+            self.stdout.write(
+                f'{title:<28} {total / pages / 1024:10.1f} КБ на страницу')
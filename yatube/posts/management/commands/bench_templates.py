@@ -0,0 +1,109 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.backends.django import DjangoTemplates, Template
+from django.test import Client
+
+from core.template_cache import template_names
+from posts.benchmark import scenarios
+
+
+def engine(cached):
+    """Движок с настройками проекта и загрузчиками с кэшем или без."""
+    params = dict(settings.TEMPLATES[0])
+    del params['BACKEND']
+    options = dict(params['OPTIONS'])
+    options['loaders'] = settings.TEMPLATE_LOADERS
+    if cached:
+        options['loaders'] = [
+            ('django.template.loaders.cached.Loader', options['loaders'])]
+    params.update(NAME=f'bench_{cached}', APP_DIRS=False, OPTIONS=options)
+    return DjangoTemplates(params)
+
+
+@contextmanager
+def captured_contexts():
+    """Контекст и запрос первого рендеринга каждого шаблона страницы."""
+    contexts = {}
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        contexts.setdefault(self.origin.template_name, (context, request))
+        return original(self, context, request)
+
+    Template.render = render
+    try:
+        yield contexts
+    finally:
+        Template.render = original
+
+
+def median_ms(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+class Command(BaseCommand):
+    help = ('Время разбора и рендеринга шаблонов posts/ с загрузчиками '
+            'без кэша (как при DEBUG) и с cached.Loader после прогрева')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            selected = [
+                scenario for scenario in scenarios()
+                if scenario.method == 'GET'
+            ]
+        except ValueError as error:
+            raise CommandError(error)
+        # Контексты страниц берутся из настоящих ответов представлений.
+        clients = {}
+        with captured_contexts() as contexts:
+            for scenario in selected:
+                key = scenario.user.pk if scenario.user else None
+                if key not in clients:
+                    clients[key] = Client()
+                    if scenario.user:
+                        clients[key].force_login(scenario.user)
+                clients[key].get(scenario.url)
+        repeat = options['repeat']
+        plain, cached = engine(cached=False), engine(cached=True)
+        names = [
+            name for name in template_names(settings.TEMPLATES_DIR)
+            if name.startswith('posts/')
+        ]
+        started = time.perf_counter()
+        for name in template_names(settings.TEMPLATES_DIR):
+            cached.get_template(name)
+        self.stdout.write(
+            f'Прогрев: {time.perf_counter() - started:.3f} с')
+        self.stdout.write(
+            f'{"шаблон":<40} {"разбор":>8} {"без кэша":>9} '
+            f'{"с кэшем":>8} {"ускорение":>10}')
+        for name in names:
+            parse = median_ms(lambda: plain.get_template(name), repeat)
+            line = f'{name:<40} {parse:8.2f}'
+            if name in contexts:
+                context, request = contexts[name]
+                before, after = (
+                    median_ms(
+                        lambda: backend.get_template(name).render(
+                            context, request),
+                        repeat)
+                    for backend in (plain, cached)
+                )
+                line += (f' {before:9.2f} {after:8.2f} '
+                         f'{before / after:9.1f}x')
+            self.stdout.write(line)
+        self.stdout.write(
+            'Время в мс, медиана; рендеринг — шаблоны страниц вместе '
+            'с include')
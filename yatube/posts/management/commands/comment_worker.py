@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.comments import get_queue, process_queue
+
+
+class Command(BaseCommand):
+    help = 'Записывает комментарии из очереди пачками (ASYNC_COMMENTS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Комментариев в пачке (по умолчанию COMMENT_BATCH_SIZE)')
+        parser.add_argument(
+            '--interval', type=float, default=0.2,
+            help='Пауза между пачками, сек.: комментарии, пришедшие за '
+                 'это время, записываются вместе')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и выйти')
+
+    def handle(self, *args, **options):
+        get_queue().recover()
+        while True:
+            processed = process_queue(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Записано заданий: {processed}')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Готово'))
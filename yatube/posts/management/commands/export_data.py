@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import FORMATS, export_data
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в каталог '
+            '(JSON Lines или CSV) вместе с картинками постов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог выгрузки')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Строк в одном запросе к базе')
+        parser.add_argument(
+            '--no-images', action='store_false', dest='images',
+            help='Не копировать картинки постов')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию в каталоге '
+                 'выгрузки); с ним прерванная выгрузка продолжается')
+
+    def handle(self, *args, **options):
+        result = export_data(
+            options['directory'],
+            file_format=options['format'],
+            chunk_size=options['chunk_size'],
+            images=options['images'],
+            checkpoint_path=options['checkpoint'],
+            report=self.stdout.write,
+        )
+        total = sum(result.values())
+        self.stdout.write(self.style.SUCCESS(f'Выгружено строк: {total}'))
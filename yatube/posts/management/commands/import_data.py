@@ -0,0 +1,45 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import FORMATS, import_data
+
+
+class Command(BaseCommand):
+    help = ('Загружает каталог, созданный export_data; пользователи '
+            'ищутся по имени')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог выгрузки')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одном bulk_create и одной транзакции')
+        parser.add_argument(
+            '--no-images', action='store_false', dest='images',
+            help='Не копировать картинки постов в хранилище')
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных пользователей без пароля')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию в каталоге '
+                 'выгрузки); с ним прерванная загрузка продолжается')
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['directory']):
+            raise CommandError(f'Каталог {options["directory"]} не найден')
+        try:
+            result = import_data(
+                options['directory'],
+                file_format=options['format'],
+                batch_size=options['batch_size'],
+                images=options['images'],
+                create_users=options['create_users'],
+                checkpoint_path=options['checkpoint'],
+                report=self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        total = sum(result.values())
+        self.stdout.write(self.style.SUCCESS(f'Прочитано строк: {total}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Заполняет полнотекстовый индекс постов заново'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=search.BATCH_SIZE,
+            help='Сколько постов индексировать за один запрос')
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite')
+        indexed = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Follow, User
+from posts.timeline import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблицы подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', dest='username',
+            help='Пересобрать ленту только этого пользователя')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            pk__in=Follow.objects.values('user_id')).order_by('pk')
+        if options['username']:
+            users = User.objects.filter(username=options['username'])
+            if not users.exists():
+                raise CommandError(
+                    f'Пользователь {options["username"]} не найден')
+        total = 0
+        for user in users.iterator():
+            rebuild(user)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано лент: {total}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк проверять и обновлять за одну транзакцию')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать расхождения, ничего не меняя')
+
+    def handle(self, *args, **options):
+        result = repair_counters(
+            batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(
+            f'Создано строк счётчиков: {result["created"]}\n'
+            f'{verb} расхождений у пользователей: {result["users"]}\n'
+            f'{verb} расхождений у постов: {result["posts"]}'
+        )
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchdata import seed
+
+
+class Command(BaseCommand):
+    help = ('Создаёт данные для бенчмарков и оценки ёмкости: '
+            'пользователей, группы, посты с картинками, комментарии '
+            'и подписки со степенным распределением активности')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument(
+            '--comments-per-post', type=float, default=2.0)
+        parser.add_argument(
+            '--follows-per-user', type=float, default=20.0)
+        parser.add_argument(
+            '--image-share', type=float, default=0.3,
+            help='Доля постов с картинкой')
+        parser.add_argument(
+            '--image-files', type=int, default=5,
+            help='Сколько разных картинок-заглушек создать')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределены даты постов')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Процессов генерации (по умолчанию — число ядер); '
+                 'от него данные не зависят')
+
+    def handle(self, *args, **options):
+        try:
+            created = seed(
+                seed=options['seed'],
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments_per_post=options['comments_per_post'],
+                follows_per_user=options['follows_per_user'],
+                image_share=options['image_share'],
+                image_files=options['image_files'],
+                days=options['days'],
+                workers=options['workers'],
+                report=self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        for table, count in created.items():
+            self.stdout.write(f'{table}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            'Готово; миниатюры создаст manage.py thumbnail_worker'))
@@ -0,0 +1,33 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import get_queue, process_queue
+
+
+class Command(BaseCommand):
+    help = 'Генерирует миниатюры картинок постов из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов пула (по умолчанию — число ядер)')
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между проверками пустой очереди, сек.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и выйти')
+
+    def handle(self, *args, **options):
+        get_queue().recover()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                processed = process_queue(executor=pool)
+                if processed:
+                    self.stdout.write(f'Обработано заданий: {processed}')
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Готово'))
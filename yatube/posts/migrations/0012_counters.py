@@ -0,0 +1,68 @@
+# Generated by Django 2.2.16 on 2026-10-17 18:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(field).annotate(
+                total=Count('pk')).values('total')
+        ),
+        Value(0)
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post.objects.update(comments_count=_count(
+        Comment.objects.filter(post=OuterRef('pk'), active=True), 'post'))
+    rows = User.objects.annotate(
+        posts_count=_count(
+            Post.objects.filter(author=OuterRef('pk')), 'author'),
+        followers_count=_count(
+            Follow.objects.filter(author=OuterRef('pk')), 'author'),
+        following_count=_count(
+            Follow.objects.filter(user=OuterRef('pk')), 'user'),
+    ).values('pk', 'posts_count', 'followers_count', 'following_count')
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=row.pop('pk'), **row) for row in rows.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_auto_20220702_1456'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
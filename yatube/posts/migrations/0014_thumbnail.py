@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-17 19:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Thumbnail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='Исходная картинка')),
+                ('geometry', models.CharField(max_length=20, verbose_name='Размер')),
+                ('image', models.ImageField(height_field='height', upload_to='thumbnails/', verbose_name='Миниатюра', width_field='width')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnails', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Миниатюра',
+                'verbose_name_plural': 'Миниатюры',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='thumbnail',
+            constraint=models.UniqueConstraint(fields=('post', 'geometry'), name='unique_post_thumbnail'),
+        ),
+    ]
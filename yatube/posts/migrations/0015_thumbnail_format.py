@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-17 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_thumbnail'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='thumbnail',
+            name='unique_post_thumbnail',
+        ),
+        migrations.AddField(
+            model_name='thumbnail',
+            name='format',
+            field=models.CharField(default='jpeg', max_length=10, verbose_name='Формат'),
+        ),
+        migrations.AddConstraint(
+            model_name='thumbnail',
+            constraint=models.UniqueConstraint(fields=('post', 'geometry', 'format'), name='unique_post_thumbnail_format'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+import re
+
+from django.db import migrations
+
+from posts.stemmer import stem
+
+TABLE = 'posts_post_fts'
+
+
+def index_text(text):
+    return ' '.join(stem(word) for word in re.findall(r'\w+', text))
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+            f"body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        rows = Post.objects.values_list('pk', 'text').iterator()
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            ((pk, index_text(text)) for pk, text in rows)
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_thumbnail_format'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 User = get_user_model()
 
@@ -13,7 +13,47 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class AtomicSaveMixin:
+    """Сохраняет объект в транзакции вместе с обработчиками post_save.
+
+    Обработчики обновляют денормализованные счётчики, и запись
+    не должна оказаться в базе без их изменения.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    # Колонки, которые лента не выводит: их не тянем из базы.
+    FEED_DEFERRED_FIELDS = (
+        'author__password',
+        'author__last_login',
+        'author__is_superuser',
+        'author__email',
+        'author__is_staff',
+        'author__is_active',
+        'author__date_joined',
+        'group__description',
+    )
+
+    def for_feed(self):
+        """Посты для ленты с автором и группой одним запросом."""
+        return self.select_related('author', 'group').defer(
+            *self.FEED_DEFERRED_FIELDS)
+
+    def for_group(self, group):
+        return self.for_feed().filter(group=group)
+
+    def for_author(self, author):
+        return self.for_feed().filter(author=author)
+
+    def for_follower(self, user):
+        return self.for_feed().filter(author__following__user=user)
+
+
+class Post(AtomicSaveMixin, models.Model):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -46,18 +86,44 @@ class Post(models.Model):
     )
     # Аргумент upload_to указывает директорию,
     # в которую будут загружаться пользовательские файлы.
+    comments_count = models.PositiveIntegerField(
+        'Активных комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date', '-pk']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты сортируют по (-pub_date, -pk) и фильтруют по автору
+        # или группе: индексы отдают страницу без сортировки.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         # выводим текст поста
         return self.text
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа на момент загрузки: при переносе поста в другую группу
+        # сбрасываем кэш обеих групп.
+        instance.loaded_group_id = instance.__dict__.get('group_id')
+        return instance
 
-class Comment(models.Model):
+
+class Comment(AtomicSaveMixin, models.Model):
     post = models.ForeignKey(
         Post,
         related_name='comments',
@@ -76,12 +142,18 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                condition=models.Q(active=True),
+                name='comment_post_active_idx'),
+        ]
 
     def __str__(self):
         return 'Comment by {} on {}'.format(self.author, self.post)
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -100,3 +172,103 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'], name="unique_followers")
         ]
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, обновляемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок: пост автора, на которого подписан user.
+
+    Заполняется при публикации поста (fan-out on write), поэтому лента
+    «Избранные авторы» читается одним диапазоном индекса по user.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    # Копия Post.pub_date, чтобы сортировать без обращения к постам.
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+
+
+class Thumbnail(models.Model):
+    """Готовая миниатюра картинки поста одного из размеров шаблонов."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnails',
+        verbose_name='Пост'
+    )
+    # Имя исходного файла: после замены картинки старые миниатюры
+    # не используются, пока не готовы новые.
+    source = models.CharField('Исходная картинка', max_length=255)
+    geometry = models.CharField('Размер', max_length=20)
+    format = models.CharField('Формат', max_length=10, default='jpeg')
+    image = models.ImageField(
+        'Миниатюра',
+        upload_to='thumbnails/',
+        width_field='width',
+        height_field='height'
+    )
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+
+    class Meta:
+        verbose_name = 'Миниатюра'
+        verbose_name_plural = 'Миниатюры'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'geometry', 'format'],
+                name='unique_post_thumbnail_format')
+        ]
+
+    def __str__(self):
+        return f'{self.geometry} {self.format} для поста {self.post_id}'
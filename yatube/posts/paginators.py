@@ -0,0 +1,349 @@
+import re
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .cache import COUNT_KEY
+
+# Начиная с этого числа строк по оценке планировщика точный COUNT(*)
+# по всей таблице не выполняется.
+ESTIMATE_THRESHOLD = 100000
+# Только ASCII-цифры: str.isdigit() и \d пропускают, например, «²».
+DIGITS_RE = re.compile(r'[0-9]+')
+# Больше не помещается в INTEGER SQLite и bigint PostgreSQL.
+MAX_ID = 2 ** 63 - 1
+
+
+def page_window(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям; None — многоточие.
+
+    Размер окна не зависит от числа страниц.
+    """
+    window = []
+    for page in range(1, num_pages + 1):
+        if (page <= on_ends or page > num_pages - on_ends
+                or abs(page - number) <= on_each_side):
+            window.append(page)
+        elif window[-1] is not None:
+            window.append(None)
+    return window
+
+
+def table_estimate(model):
+    """Число строк таблицы по статистике планировщика или None."""
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples FROM pg_class WHERE relname = %s'
+    elif connection.vendor == 'sqlite':
+        # sqlite_stat1 заполняет ANALYZE: первое число — строки таблицы.
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # Статистики ещё нет: ANALYZE не запускался.
+        return None
+    if row is None:
+        return None
+    return int(float(str(row[0]).split()[0]))
+
+
+class LazyPage(Page):
+    """Страница, которая выбирает записи при первом обращении к ним.
+
+    cursor — ключ страницы для кэша фрагмента — известен без запроса,
+    поэтому при попадании в кэш фрагмента выборка не выполняется.
+    Остальные атрибуты берутся у страницы, которую возвращает load().
+    """
+
+    def __init__(self, load, cursor, paginator):
+        self._load = load
+        self.cursor = cursor
+        self.paginator = paginator
+
+    @cached_property
+    def _page(self):
+        return self._load()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._page, name)
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу сортировки (keyset) без COUNT(*) и OFFSET.
+
+    Страница задаётся непрозрачным курсором — закодированными значениями
+    полей сортировки первой или последней записи соседней страницы,
+    поэтому выборка любой страницы — это чтение диапазона по индексу.
+    """
+    # Поля сортировки в порядке приоритета; последнее должно быть
+    # уникальным, чтобы порядок был строгим.
+    ordering = ('-pub_date', '-pk')
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs)
+
+    @property
+    def _fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [self._get_value(obj, field) for field in self._fields]
+        raw = '|'.join(
+            value.isoformat() if hasattr(value, 'isoformat') else str(value)
+            for value in values
+        )
+        return urlsafe_base64_encode(raw.encode())
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения полей курсора или None, если он испорчен."""
+        try:
+            raw = urlsafe_base64_decode(cursor).decode()
+        except (TypeError, ValueError, UnicodeDecodeError):
+            return None
+        parts = raw.split('|')
+        if len(parts) != len(self._fields):
+            return None
+        values = []
+        for field, part in zip(self._fields, parts):
+            value = self._parse_value(field, part)
+            if value is None:
+                return None
+            values.append(value)
+        return values
+
+    def _get_value(self, obj, field):
+        if isinstance(obj, dict):
+            return obj[field]
+        return getattr(obj, field)
+
+    def _parse_value(self, field, raw):
+        if field == 'pk' or field.endswith('id'):
+            if not DIGITS_RE.fullmatch(raw):
+                return None
+            value = int(raw)
+            return value if value <= MAX_ID else None
+        try:
+            value = parse_datetime(raw)
+        except ValueError:
+            return None
+        if value is not None and settings.USE_TZ and value.tzinfo is None:
+            # Курсоры кодируют время с часовым поясом; наивное время
+            # при USE_TZ — подделанный курсор.
+            return None
+        return value
+
+    def _seek(self, values, forward):
+        """Условие «строго после курсора» в порядке сортировки.
+
+        forward=False — строго до курсора (предыдущие записи).
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # Избыточное условие по первому полю позволяет СУБД начать чтение
+        # индекса сразу с курсора, а не отбрасывать строки с начала.
+        name = self.ordering[0].lstrip('-')
+        descending = self.ordering[0].startswith('-')
+        lookup = 'lte' if descending == forward else 'gte'
+        return Q(**{f'{name}__{lookup}': values[0]}) & condition
+
+    def after(self, cursor):
+        """Все записи после курсора (без него — с начала ленты).
+
+        None, если курсор испорчен.
+        """
+        if not cursor:
+            return self.object_list
+        values = self.decode_cursor(cursor)
+        if values is None:
+            return None
+        return self.object_list.filter(self._seek(values, True))
+
+    def _reversed_ordering(self):
+        return [
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        ]
+
+    def transform(self, objects):
+        """Преобразует выбранные строки в элементы страницы."""
+        return objects
+
+    def _make_page(self, objects, number, has_previous, has_next):
+        page = Page(self.transform(objects), number, self)
+        page.next_cursor = (
+            self.encode_cursor(objects[-1]) if has_next and objects else None)
+        page.previous_cursor = (
+            self.encode_cursor(objects[0])
+            if has_previous and objects else None)
+        return page
+
+    def _first_page(self):
+        objects = list(self.object_list[:self.per_page + 1])
+        has_next = len(objects) > self.per_page
+        page = self._make_page(objects[:self.per_page], 1, False, has_next)
+        page.cursor = ''
+        return page
+
+    def cursor_page(self, after=None, before=None):
+        """Страница после курсора `after` или перед курсором `before`."""
+        values = None
+        forward = True
+        if after:
+            values = self.decode_cursor(after)
+        elif before:
+            values = self.decode_cursor(before)
+            forward = False
+        if values is None:
+            return self._first_page()
+        queryset = self.object_list.filter(self._seek(values, forward))
+        if not forward:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        objects = list(queryset[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if not forward and not objects:
+            # Перед курсором ничего нет: первые посты удалены или курсор
+            # указывает на начало ленты.
+            return self._first_page()
+        if forward:
+            page = self._make_page(objects, None, True, has_more)
+            page.cursor = f'after:{after}'
+        else:
+            objects.reverse()
+            page = self._make_page(objects, None, has_more, True)
+            page.cursor = f'before:{before}'
+            if not has_more:
+                # Дошли до начала ленты — это первая страница.
+                page.number = 1
+                page.previous_cursor = None
+        return page
+
+    def numbered_page(self, number):
+        """Старая нумерованная страница (?page=N) с курсорами соседей."""
+        page = self.get_page(number)
+        objects = list(page.object_list)
+        page.object_list = self.transform(objects)
+        page.next_cursor = (
+            self.encode_cursor(objects[-1]) if page.has_next() else None)
+        page.previous_cursor = (
+            self.encode_cursor(objects[0]) if page.has_previous() else None)
+        page.cursor = f'page:{page.number}'
+        return page
+
+    def _page_number(self, number):
+        try:
+            return self.validate_number(number)
+        except PageNotAnInteger:
+            return 1
+        except EmptyPage:
+            return self.num_pages
+
+    def _cursor_key(self, after, before):
+        """Ключ страницы cursor_page без выборки записей."""
+        if after:
+            return f'after:{after}' if self.decode_cursor(after) else ''
+        if before and self.decode_cursor(before):
+            return f'before:{before}'
+        return ''
+
+    def page_from_request(self, request):
+        after = request.GET.get('after')
+        before = request.GET.get('before')
+        number = request.GET.get('page')
+        if number and not (after or before):
+            return self.numbered_page(number)
+        return self.cursor_page(after=after, before=before)
+
+    def lazy_page_from_request(self, request):
+        """Как page_from_request, но записи выбираются при первом
+        обращении к ним (для страниц в кэше фрагментов)."""
+        after = request.GET.get('after')
+        before = request.GET.get('before')
+        number = request.GET.get('page')
+        if number and not (after or before):
+            number = self._page_number(number)
+            return LazyPage(
+                partial(self.numbered_page, number), f'page:{number}', self)
+        return LazyPage(
+            partial(self.cursor_page, after=after, before=before),
+            self._cursor_key(after, before), self)
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста от старых к новым, страницы — курсором."""
+    ordering = ('created', 'pk')
+
+
+class CountedPaginator(CursorPaginator):
+    """Курсорный пагинатор с номерами страниц и дешёвым числом записей.
+
+    Число записей берётся из total (например, денормализованного
+    счётчика), из кэша по ключу count_key (сбрасывается сигналами при
+    создании и удалении постов) или, при estimate=True, из оценки
+    планировщика для больших таблиц. Номера выводятся окном page_window.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 estimate=False, total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.estimate = estimate
+        self.total = total
+
+    def _estimated_count(self):
+        estimate = table_estimate(self.object_list.model)
+        if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+            return estimate
+        return None
+
+    @cached_property
+    def count(self):
+        if self.total is not None:
+            return self.total
+        key = COUNT_KEY.format(self.count_key) if self.count_key else None
+        count = cache.get(key) if key else None
+        if count is None:
+            if self.estimate:
+                count = self._estimated_count()
+            if count is None:
+                count = self.object_list.count()
+            if key:
+                cache.set(key, count, settings.FEED_CACHE_TIMEOUT)
+        return count
+
+    def _make_page(self, objects, number, has_previous, has_next):
+        page = super()._make_page(objects, number, has_previous, has_next)
+        # Вызывается из шаблона: число записей считается, только если
+        # номера действительно выводятся.
+        page.page_window = partial(self._window, page)
+        return page
+
+    def numbered_page(self, number):
+        page = super().numbered_page(number)
+        page.page_window = partial(self._window, page)
+        return page
+
+    def _window(self, page):
+        if page.number is None:
+            return []
+        return page_window(page.number, self.num_pages)
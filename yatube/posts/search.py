@@ -0,0 +1,167 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Виртуальная таблица posts_post_fts хранит основы слов текста поста
+(rowid — id поста) и обновляется обработчиками сигналов
+(posts.signals). Основы считает posts.stemmer, поэтому запрос «книгами»
+находит пост со словом «книга». Результаты упорядочены по релевантности
+(bm25). На других СУБД поиск сводится к icontains.
+"""
+import re
+
+from django.db import connection, transaction
+
+from .models import Post
+from .stemmer import stem
+
+TABLE = 'posts_post_fts'
+# Слова запроса сверх лимита не учитываются.
+MAX_TERMS = 10
+BATCH_SIZE = 1000
+
+WORD_RE = re.compile(r'\w+')
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def index_text(text):
+    """Текст поста в виде основ слов для индекса."""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def match_query(query):
+    """Выражение MATCH: все основы слов запроса, каждая в кавычках."""
+    terms = []
+    for word in WORD_RE.findall(query):
+        term = stem(word)
+        if term not in terms:
+            terms.append(term)
+    return ' '.join(f'"{term}"' for term in terms[:MAX_TERMS])
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            [post.pk, index_text(post.text)]
+        )
+
+
+def index_posts(posts):
+    """Добавляет в индекс пачку постов одним executemany."""
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [(post.pk,) for post in posts]
+        )
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            [(post.pk, index_text(post.text)) for post in posts]
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Заполняет индекс заново пачками по диапазонам id.
+
+    Всё делается в одной транзакции: пока она идёт, поиск видит старый
+    индекс, а при ошибке старый индекс и остаётся. Возвращает число
+    проиндексированных постов.
+    """
+    indexed = 0
+    last_pk = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        while True:
+            rows = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'text')[:batch_size]
+            )
+            if not rows:
+                break
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+                [(pk, index_text(text)) for pk, text in rows]
+            )
+            last_pk = rows[-1][0]
+            indexed += len(rows)
+        # Слияние сегментов индекса ускоряет последующие запросы.
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def filter_queryset(queryset, query):
+    """Посты queryset, подходящие под запрос (без упорядочивания)."""
+    match = match_query(query)
+    if not match:
+        return queryset.none()
+    if not available():
+        return queryset.filter(text__icontains=query)
+    # RawSQL в pk__in оборачивается в лишние скобки, и SQLite берёт
+    # только первую строку подзапроса, поэтому условие задаётся в extra.
+    return queryset.extra(
+        where=[
+            f'{Post._meta.db_table}.id IN '
+            f'(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)'
+        ],
+        params=[match]
+    )
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности.
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    срез выбирает из индекса только id постов страницы.
+    """
+
+    def __init__(self, query):
+        self.match = match_query(query)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.match:
+                self._count = 0
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT count(*) FROM {TABLE} '
+                        f'WHERE {TABLE} MATCH %s',
+                        [self.match]
+                    )
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if not self.match or stop <= start:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.match, stop - start, start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search(query):
+    """Посты по запросу: ранжированные результаты FTS5 или icontains."""
+    if not available():
+        return filter_queryset(Post.objects.for_feed(), query)
+    return SearchResults(query)
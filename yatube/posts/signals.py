@@ -0,0 +1,103 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import counters, search, timeline
+from .cache import bump, invalidate_counts, post_scopes
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, **kwargs):
+    if search.available():
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    if search.available():
+        search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    bump(*post_scopes(instance))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_counts_changed(sender, instance, created=True, **kwargs):
+    # post_delete не передаёт created: удаление меняет число записей так же.
+    groups = {instance.group_id, getattr(instance, 'loaded_group_id', None)}
+    group_scopes = [f'group:{group_id}' for group_id in groups if group_id]
+    if created:
+        invalidate_counts('posts', *group_scopes)
+    elif len(group_scopes) > 1:
+        # Пост перенесли в другую группу.
+        invalidate_counts(*group_scopes)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump('groups', f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        # Вход пользователя не меняет того, что видно в лентах.
+        return
+    bump('users', f'author:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        if instance.active:
+            counters.bump_comments(instance.post_id, 1)
+    else:
+        # Комментарий могли скрыть или вернуть: пересчитываем пост.
+        counters.recount_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.active:
+        counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, followers_count=1)
+        counters.bump_user(instance.user_id, following_count=1)
+        timeline.backfill([instance.user_id], instance.author_id)
+        bump(f'follows:{instance.author_id}', f'follows:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers_count=-1)
+    counters.bump_user(instance.user_id, following_count=-1)
+    timeline.author_unfollowed(instance.user_id, instance.author_id)
+    bump(f'follows:{instance.author_id}', f'follows:{instance.user_id}')
@@ -0,0 +1,78 @@
+"""Стеммер Портера для русского языка (алгоритм Snowball).
+
+Отрезает окончания, чтобы «книга», «книги» и «книгами» искались
+одинаково. Слова без кириллицы только приводятся к нижнему регистру.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(ся|сь)$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем'
+    r'|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+CYRILLIC = re.compile('[а-я]')
+
+
+def _region(word, start=0):
+    """Начало области после первой согласной, следующей за гласной."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _cut(pattern, text):
+    """Отрезает окончание pattern; второе значение — нашлось ли оно."""
+    result = pattern.sub('', text, count=1)
+    return result, result != text
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    first_vowel = next(
+        (i for i, char in enumerate(word) if char in VOWELS), None)
+    if first_vowel is None:
+        return word
+    # RV — часть слова после первой гласной: окончания ищутся в ней.
+    prefix, rv = word[:first_vowel + 1], word[first_vowel + 1:]
+    r2 = _region(word, _region(word))
+
+    rv, found = _cut(PERFECTIVE_GERUND, rv)
+    if not found:
+        rv, _ = _cut(REFLEXIVE, rv)
+        rv, found = _cut(ADJECTIVE, rv)
+        if found:
+            rv, _ = _cut(PARTICIPLE, rv)
+        else:
+            rv, found = _cut(VERB, rv)
+            if not found:
+                rv, _ = _cut(NOUN, rv)
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    match = DERIVATIONAL.search(rv)
+    if match and len(prefix) + match.start() >= r2:
+        rv = rv[:match.start()]
+
+    rv, _ = _cut(SUPERLATIVE, rv)
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
@@ -0,0 +1,137 @@
+import re
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.safestring import mark_safe
+
+from core.cache import get_or_recompute
+from core.metrics import record_cache
+from posts.cache import generation_values
+
+register = template.Library()
+
+# Метка места для персональной части карточки: имя, пост, автор.
+VIEWER_SLOT = '<!--viewer:{}:{}:{}-->'
+VIEWER_SLOT_RE = re.compile(r'<!--viewer:(\w+):(\d+):(\d+)-->')
+
+
+def _card_versions(context, post):
+    """Версии карточек всех постов страницы одним запросом к кэшу."""
+    versions = context.render_context.get('post_card_versions')
+    if versions is None or post.pk not in versions:
+        posts = list(context.get('page_obj') or [])
+        if post not in posts:
+            posts = [post]
+        values = generation_values(
+            [f'post:{item.pk}' for item in posts] + ['users', 'groups'])
+        shared = f'{values["users"]}.{values["groups"]}'
+        versions = {
+            item.pk: f'{values[f"post:{item.pk}"]}.{shared}'
+            for item in posts
+        }
+        context.render_context['post_card_versions'] = versions
+    return versions[post.pk]
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, variant):
+    """Карточка поста, общая для всех зрителей.
+
+    Кэшируется по версии поста, поэтому не зависит от того, кто
+    смотрит страницу; персональные части оставляют метки viewer_slot,
+    которые заполняет {% personalize %}.
+    """
+    key = f'post_card:{variant}:{post.pk}:{_card_versions(context, post)}'
+    html = cache.get(key)
+    record_cache('post_card', hit=html is not None)
+    if html is None:
+        card = context.template.engine.get_template(
+            f'posts/includes/cards/{variant}.html')
+        with context.push(post=post):
+            html = card.render(context)
+        cache.set(key, html, settings.FEED_CACHE_TIMEOUT)
+    return mark_safe(html)
+
+
+@register.simple_tag
+def viewer_slot(name, post):
+    """Метка персональной части карточки поста."""
+    return mark_safe(VIEWER_SLOT.format(name, post.pk, post.author_id))
+
+
+class PersonalizeNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        html = self.nodelist.render(context)
+        engine = context.template.engine
+
+        def fill(match):
+            name, post_id, author_id = match.groups()
+            slot = engine.get_template(f'posts/includes/viewer/{name}.html')
+            with context.push(post_id=int(post_id), author_id=int(author_id)):
+                return slot.render(context)
+
+        return mark_safe(VIEWER_SLOT_RE.sub(fill, html))
+
+
+@register.tag
+def personalize(parser, token):
+    """Заполняет метки viewer_slot в общем (кэшированном) HTML.
+
+    {% personalize %}...{% endpersonalize %}
+    """
+    nodelist = parser.parse(('endpersonalize',))
+    parser.delete_first_token()
+    return PersonalizeNode(nodelist)
+
+
+class FeedFragmentNode(template.Node):
+    def __init__(self, nodelist, timeout, name, vary_on, version):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        key = make_template_fragment_key(
+            self.name, [var.resolve(context) for var in self.vary_on])
+        version = self.version.resolve(context) if self.version else None
+        return mark_safe(get_or_recompute(
+            key, lambda: self.nodelist.render(context), timeout,
+            name=self.name, version=version))
+
+
+@register.tag
+def feed_fragment(parser, token):
+    """Как {% cache %}, но с защитой от лавины пересчётов.
+
+    {% feed_fragment timeout name [vary_on ...] [version=...] %}
+    ...
+    {% endfeed_fragment %}
+
+    version (поколения областей, feed_version) не входит в ключ: после
+    устаревания или изменения данных фрагмент собирает один процесс,
+    остальные отдают прежнюю версию (core.cache.get_or_recompute).
+    """
+    bits = token.split_contents()
+    version = None
+    if len(bits) > 3 and bits[-1].startswith('version='):
+        version = parser.compile_filter(bits.pop()[len('version='):])
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} ожидает время жизни и имя фрагмента')
+    nodelist = parser.parse(('endfeed_fragment',))
+    parser.delete_first_token()
+    return FeedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]],
+        version,
+    )
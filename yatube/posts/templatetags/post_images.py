@@ -0,0 +1,110 @@
+from django import template
+from django.conf import settings
+
+from core.metrics import timed
+from posts.models import Thumbnail
+from posts.thumbnails import FALLBACK_FORMAT, FORMATS, geometries
+
+register = template.Library()
+
+# Картинка ленты занимает всю ширину колонки, но не больше 1000px.
+FEED_IMAGE_SIZES = '(max-width: 1000px) 100vw, 1000px'
+
+
+def _page_thumbnails(context, post):
+    """Миниатюры всех постов страницы одним запросом к базе.
+
+    Карточки ленты подключаются через include, а у каждого шаблона свой
+    render_context, поэтому выборка для страницы запоминается на page_obj.
+    """
+    page = context.get('page_obj')
+    holder = getattr(page, 'post_thumbnails', None)
+    if holder is None:
+        holder = context.render_context.get('post_thumbnails')
+    if holder is not None and post.pk in holder:
+        return holder[post.pk]
+    posts = list(page or [])
+    on_page = post in posts
+    if not on_page:
+        posts = [post]
+    thumbnails = {item.pk: {} for item in posts}
+    sources = {item.pk: item.image.name for item in posts if item.image}
+    with timed('thumbnail_time'):
+        queryset = Thumbnail.objects.filter(post_id__in=list(sources))
+        for thumb in queryset:
+            if sources[thumb.post_id] == thumb.source:
+                key = (thumb.geometry, thumb.format)
+                thumbnails[thumb.post_id][key] = thumb
+    if on_page:
+        page.post_thumbnails = thumbnails
+    else:
+        context.render_context['post_thumbnails'] = thumbnails
+    return thumbnails[post.pk]
+
+
+@register.simple_tag(takes_context=True)
+def post_thumbnail(context, post, geometry):
+    """Готовая миниатюра картинки поста размера geometry.
+
+    {% post_thumbnail post "1000" as im %} — у im есть url, width и
+    height. Пока фоновый обработчик не создал миниатюру, отдаётся
+    исходная картинка без размеров. Файлы картинок не открываются.
+    """
+    if not post.image:
+        return None
+    if geometry not in geometries():
+        raise template.TemplateSyntaxError(
+            f'Размер {geometry} не указан в POST_THUMBNAIL_GEOMETRIES')
+    thumb = _page_thumbnails(context, post).get((geometry, FALLBACK_FORMAT))
+    if thumb is None:
+        return {'url': post.image.url, 'width': None, 'height': None}
+    return {'url': thumb.image.url, 'width': thumb.width,
+            'height': thumb.height}
+
+
+def _srcset(thumbnails, image_format):
+    """Строка srcset формата из миниатюр ширин POST_IMAGE_WIDTHS.
+
+    Маленькие картинки не увеличиваются, поэтому одинаковые по ширине
+    варианты выводятся один раз.
+    """
+    candidates = {}
+    for width in settings.POST_IMAGE_WIDTHS:
+        thumb = thumbnails.get((str(width), image_format))
+        if thumb is not None:
+            candidates.setdefault(thumb.width, thumb)
+    return ', '.join(
+        f'{thumb.image.url} {width}w'
+        for width, thumb in sorted(candidates.items())
+    )
+
+
+@register.inclusion_tag('posts/includes/picture.html', takes_context=True)
+def post_picture(context, post, css_class='', sizes=FEED_IMAGE_SIZES):
+    """Адаптивная картинка поста: <picture> с srcset по форматам.
+
+    Браузер сам выбирает самый лёгкий подходящий вариант: AVIF или WebP,
+    если умеет их показывать, и наименьшую достаточную ширину. В <img>
+    остаётся JPEG шириной 1000px с размерами для резерва места.
+    """
+    if not post.image:
+        return {'picture': None}
+    thumbnails = _page_thumbnails(context, post)
+    sources = []
+    for image_format in settings.POST_IMAGE_FORMATS:
+        if image_format == FALLBACK_FORMAT:
+            continue
+        srcset = _srcset(thumbnails, image_format)
+        if srcset:
+            sources.append(
+                {'type': FORMATS[image_format].mime, 'srcset': srcset})
+    largest = str(max(settings.POST_IMAGE_WIDTHS))
+    fallback = thumbnails.get((largest, FALLBACK_FORMAT))
+    picture = {
+        'sources': sources,
+        'srcset': _srcset(thumbnails, FALLBACK_FORMAT),
+        'url': fallback.image.url if fallback else post.image.url,
+        'width': fallback.width if fallback else None,
+        'height': fallback.height if fallback else None,
+    }
+    return {'picture': picture, 'css_class': css_class, 'sizes': sizes}
@@ -0,0 +1,151 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import urlsafe_base64_encode
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+def load(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
+@override_settings(PER_PAGE=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='one',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Пост {i}', group=cls.group)
+            for i in range(5)
+        ]
+        cls.post = cls.posts[-1]
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {i}')
+            for i in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def walk(self, client, url):
+        """Все записи ленты по курсорам next."""
+        ids = []
+        data = load(client.get(url))
+        ids += [item['id'] for item in data['results']]
+        while data['next']:
+            data = load(client.get(url, {'after': data['next']}))
+            ids += [item['id'] for item in data['results']]
+        return ids
+
+    def test_feeds_walk_all_posts(self):
+        """Курсор проходит ленты без пропусков и повторов."""
+        expected = [post.pk for post in reversed(self.posts)]
+        urls = {
+            reverse('api_v1:posts'): self.guest_client,
+            reverse('api_v1:group_posts', kwargs={'slug': 'one'}):
+                self.guest_client,
+            reverse('api_v1:profile', kwargs={'username': 'auth'}):
+                self.guest_client,
+            reverse('api_v1:follow'): self.authorized_client,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(client, url), expected)
+
+    def test_post_fields(self):
+        """Пост сериализуется без лишних полей, ?fields= их выбирает."""
+        url = reverse('api_v1:posts')
+        item = load(self.guest_client.get(url))['results'][0]
+        self.assertEqual(item['id'], self.post.pk)
+        self.assertEqual(item['author'], 'auth')
+        self.assertEqual(item['group'], 'one')
+        self.assertEqual(item['comments_count'], 3)
+        self.assertIsNone(item['image'])
+        item = load(self.guest_client.get(
+            url, {'fields': 'id,text'}))['results'][0]
+        self.assertEqual(item, {'id': self.post.pk, 'text': self.post.text})
+
+    def test_headers(self):
+        """Лента группы и профиль отдают группу и автора."""
+        data = load(self.guest_client.get(
+            reverse('api_v1:group_posts', kwargs={'slug': 'one'})))
+        self.assertEqual(data['group']['title'], 'Тестовая группа')
+        data = load(self.guest_client.get(
+            reverse('api_v1:profile', kwargs={'username': 'auth'})))
+        self.assertEqual(data['author']['username'], 'auth')
+        self.assertEqual(data['author']['posts_count'], 5)
+        self.assertEqual(data['author']['followers_count'], 1)
+
+    def test_post_detail_comments(self):
+        """Пост отдаётся с комментариями по порядку создания."""
+        url = reverse('api_v1:post_detail', kwargs={'post_id': self.post.pk})
+        data = load(self.guest_client.get(url, {'fields': 'id'}))
+        self.assertEqual(data['post'], {'id': self.post.pk})
+        texts = [comment['text'] for comment in data['comments']]
+        self.assertEqual(texts, ['Комментарий 0', 'Комментарий 1'])
+        data = load(self.guest_client.get(url, {'after': data['next']}))
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий 2')
+        self.assertIsNone(data['next'])
+
+    def test_values_without_models(self):
+        """Лента выбирается одним запросом без создания моделей."""
+        with mock.patch.object(Post, 'from_db', side_effect=AssertionError):
+            with self.assertNumQueries(1):
+                response = self.guest_client.get(reverse('api_v1:posts'))
+                load(response)
+
+    def test_errors(self):
+        """Ошибки запроса возвращаются в JSON."""
+        oversized = urlsafe_base64_encode(
+            b'2021-01-01T00:00:00+00:00|99999999999999999999999')
+        cases = [
+            (self.guest_client, reverse('api_v1:posts'),
+             {'fields': 'password'}, 400),
+            (self.guest_client, reverse('api_v1:posts'),
+             {'limit': '1000'}, 400),
+            (self.guest_client, reverse('api_v1:posts'),
+             {'limit': '²'}, 400),
+            (self.guest_client, reverse('api_v1:posts'),
+             {'after': '???'}, 400),
+            (self.guest_client, reverse('api_v1:posts'),
+             {'after': oversized}, 400),
+            (self.guest_client,
+             reverse('api_v1:group_posts', kwargs={'slug': 'one'}),
+             {'after': oversized}, 400),
+            (self.guest_client,
+             reverse('api_v1:group_posts', kwargs={'slug': 'none'}), {}, 404),
+            (self.guest_client, reverse('api_v1:follow'), {}, 401),
+        ]
+        for client, url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', load(response))
+
+    def test_bench_api(self):
+        """Бенчмарк сравнивает HTML и API для всех лент."""
+        out = StringIO()
+        call_command('bench_api', requests=2, cold=True, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        for line in lines:
+            self.assertIn('API быстрее', line)
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from multiprocessing import get_context
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import Max, Min
+from django.test import TestCase, override_settings
+from django.urls import resolve
+
+from ..benchdata import (
+    GENERATORS, PREFIX, Options, _generate, bounded_imap, plan, scatter,
+    tasks)
+from ..benchmark import ClientTransport, compare, run_scenario, scenarios
+from ..models import Comment, Follow, Group, Post, User
+from ..urls import urlpatterns
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_QUEUE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class BenchDataPlanTest(TestCase):
+    def test_plan_is_deterministic(self):
+        """Один seed — один и тот же план, другой seed — другой."""
+        options = {'users': 30, 'groups': 4, 'posts': 200}
+        self.assertEqual(plan(seed=1, **options), plan(seed=1, **options))
+        self.assertNotEqual(plan(seed=1, **options), plan(seed=2, **options))
+
+    def test_activity_follows_power_law(self):
+        """Немногие авторы пишут большую часть постов."""
+        data = plan(seed=0, users=100, groups=5, posts=5000)
+        counts = sorted(
+            Counter(author for author, *_ in data['posts']).values(),
+            reverse=True)
+        self.assertGreater(sum(counts[:10]), sum(counts) / 2)
+        follows = data['follows']
+        self.assertEqual(len(follows), len(set(follows)))
+        self.assertFalse(any(user == author for user, author in follows))
+
+    def test_dates_spread_over_days(self):
+        """Посты распределены по всему сроку, гуще к его концу."""
+        data = plan(seed=0, users=30, posts=2000, days=100)
+        day = 24 * 60 * 60
+        ages = [row[-1] for row in data['posts']]
+        self.assertTrue(all(0 <= age < 100 * day for age in ages))
+        self.assertGreater(max(ages), 90 * day)
+        recent = sum(age < 50 * day for age in ages)
+        self.assertGreater(recent, len(ages) * 0.6)
+        self.assertTrue(all(0 <= row[-1] < 1 for row in data['comments']))
+
+    def test_scatter_is_bijection(self):
+        for size in (1, 7, 100, 7919):
+            with self.subTest(size=size):
+                self.assertEqual(
+                    sorted(scatter(rank, size, 3) for rank in range(size)),
+                    list(range(size)))
+
+    def test_bounded_imap_limits_pending_chunks(self):
+        """Впрок раздаётся не больше limit порций."""
+        pool = mock.Mock()
+        pool.apply_async.side_effect = lambda function, args: mock.Mock(
+            get=lambda: function(*args))
+        results = bounded_imap(pool, abs, range(-10, 0), limit=3)
+        self.assertEqual(next(results), 10)
+        self.assertEqual(pool.apply_async.call_count, 4)
+        self.assertEqual(list(results), list(range(9, 0, -1)))
+
+    def test_pool_gives_same_rows(self):
+        """Порции из пула процессов совпадают с планом."""
+        options = Options(users=50, posts=12000, comments_per_post=0.5)
+        expected = plan(**options._asdict())
+        with get_context('fork').Pool(2) as pool:
+            for table in GENERATORS:
+                rows = [
+                    row
+                    for chunk in pool.imap(_generate, tasks(options, table))
+                    for row in chunk
+                ]
+                self.assertEqual(rows, expected[table])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, QUEUE_ROOT=TEMP_QUEUE_ROOT)
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_bench_data', users=20, groups=3, posts=40,
+            image_share=0.5, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_QUEUE_ROOT, ignore_errors=True)
+
+    def test_seed_creates_consistent_data(self):
+        """Данные созданы, счётчики пересчитаны, повтор — ошибка."""
+        users = User.objects.filter(username__startswith=PREFIX)
+        self.assertEqual(users.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 80)
+        self.assertTrue(Follow.objects.exists())
+        post = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        for comment in post.comments.all():
+            self.assertGreaterEqual(comment.created, post.pub_date)
+        dates = Post.objects.aggregate(
+            first=Min('pub_date'), last=Max('pub_date'))
+        self.assertGreater(dates['last'] - dates['first'], timedelta(days=30))
+        with self.assertRaises(CommandError):
+            call_command('seed_bench_data', stdout=StringIO())
+
+    def test_scenarios_cover_all_urls(self):
+        """Для каждого адреса posts/urls.py есть сценарий."""
+        covered = {
+            resolve(scenario.url.split('?')[0]).url_name
+            for scenario in scenarios()
+        }
+        self.assertEqual(covered, {pattern.name for pattern in urlpatterns})
+
+    @override_settings(SERVER_TIMING_PUBLIC=True)
+    def test_scenarios_run_without_errors(self):
+        """Сценарии отвечают без ошибок и сообщают число SQL-запросов."""
+        transport = ClientTransport()
+        for scenario in scenarios():
+            with self.subTest(scenario=scenario.name):
+                result = run_scenario(transport, scenario, 2, warmup=1)
+                self.assertEqual(result['errors'], 0)
+                self.assertIsNotNone(result['queries'])
+
+    def test_bench_command_writes_results(self):
+        """Команда пишет JSON и сравнивает его с прошлым запуском."""
+        output = os.path.join(TEMP_QUEUE_ROOT, 'bench.json')
+        call_command(
+            'bench', requests=2, warmup=0, scenario=['index', 'rss'],
+            output=output, stdout=StringIO())
+        with open(output, encoding='utf-8') as file:
+            results = json.load(file)
+        self.assertEqual(set(results['scenarios']), {'index', 'rss'})
+        self.assertEqual(results['data']['posts'], 40)
+        stdout = StringIO()
+        call_command('bench', compare=[output, output], stdout=stdout)
+        self.assertIn('index', stdout.getvalue())
+
+    def test_bench_templates_command(self):
+        """Время рендеринга шаблонов страниц без кэша и с кэшем."""
+        stdout = StringIO()
+        call_command('bench_templates', repeat=1, stdout=stdout)
+        lines = {
+            line.split()[0]: line.split()[1:]
+            for line in stdout.getvalue().splitlines()[2:-1]
+        }
+        self.assertEqual(len(lines['posts/index.html']), 4)
+        self.assertEqual(len(lines['posts/includes/picture.html']), 1)
+
+
+class CompareTest(TestCase):
+    def test_regression_detected(self):
+        """Ухудшение сверх допуска отмечается, улучшение — нет."""
+        base = {'scenarios': {'index': {
+            'rps': 100, 'p50_ms': 10, 'p99_ms': 20, 'queries': 5}}}
+        new = {'scenarios': {'index': {
+            'rps': 120, 'p50_ms': 15, 'p99_ms': 21, 'queries': 5}}}
+        rows = {row[1]: row for row in compare(base, new, tolerance=10)}
+        self.assertFalse(rows['rps'][5])
+        self.assertTrue(rows['p50_ms'][5])
+        self.assertFalse(rows['p99_ms'][5])
+        self.assertEqual(rows['p50_ms'][4], 50.0)
+        with self.assertRaises(CommandError):
+            call_command(
+                'bench', compare=[self.write(base), self.write(new)],
+                fail_on_regression=True, stdout=StringIO())
+
+    def write(self, results):
+        file = tempfile.NamedTemporaryFile(
+            'w', suffix='.json', delete=False, encoding='utf-8')
+        with file:
+            json.dump(results, file)
+        self.addCleanup(os.remove, file.name)
+        return file.name
@@ -1,7 +1,12 @@
 from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from core.cache import LOCK_KEY
+
 from ..models import Group, Post, User
 
 
@@ -22,24 +27,104 @@ class CachePagesTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         # Создаём неавторизованный клиент
         self.guest_client = Client()
         # Создаём авторизованный клиент
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
 
-    def test_cache_posts_20_sec(self):
-        """Проверяем работу cache страница index"""
-        # получим контент сначала
-        response = self.authorized_client.get(reverse('posts:index'))
-        content = response.content
-        # Удаляем запись
-        self.post.delete()
-        # Проверяем, что запись пока видно на странице
-        response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response.content, content)
-        # Очистка кэша
-        cache.clear()
-        # Проверяем, что удалённую запись НЕ видно на странице
-        response = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(response.content, content)
+    def test_cache_pages(self):
+        """Страницы лент берутся из кэша, пока данные не менялись."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                # Изменение в обход сигналов не сбрасывает кэш
+                Post.objects.filter(pk=self.post.pk).update(text='Новый')
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Текст')
+                self.assertNotContains(response, 'Новый')
+                Post.objects.filter(pk=self.post.pk).update(text='Текст')
+
+    def test_warm_fragment_skips_page_query(self):
+        """Из кэша фрагмента страница отдаётся без выборки постов."""
+        for url in self.urls:
+            for query in ('', '?page=1'):
+                with self.subTest(url=url + query):
+                    self.guest_client.get(url + query)
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.guest_client.get(url + query)
+                    self.assertContains(response, 'Текст')
+                    for sql in queries.captured_queries:
+                        self.assertNotIn('"posts_post"', sql['sql'])
+        with self.assertNumQueries(0):
+            self.guest_client.get(reverse('posts:index'))
+
+    def test_new_post_invalidates_cache(self):
+        """Новый пост сразу виден на страницах лент."""
+        for url in self.urls:
+            self.guest_client.get(url)
+        post = Post.objects.create(
+            author=self.user, text='Свежий пост', group=self.group)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Свежий пост')
+        post.delete()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotContains(response, 'Свежий пост')
+
+    def test_stale_fragment_while_other_process_recomputes(self):
+        """Ключ фрагмента не меняется при изменении данных: пока его
+        пересобирает другой процесс, отдаётся прежняя версия."""
+        url = reverse('posts:index')
+        cursor = self.guest_client.get(url).context['page_obj'].cursor
+        key = make_template_fragment_key('index_page', [cursor])
+        Post.objects.create(author=self.user, text='Свежий пост')
+        cache.add(LOCK_KEY.format(key), True)
+        self.assertNotContains(self.guest_client.get(url), 'Свежий пост')
+        cache.delete(LOCK_KEY.format(key))
+        self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+    def test_group_change_invalidates_cache(self):
+        """Изменение группы сбрасывает кэш её ленты."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        self.group.title = 'Переименованная группа'
+        self.group.save()
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Переименованная группа')
+
+    def test_shared_cache_personal_parts(self):
+        """Общий кэш страницы не переносит кнопки одного зрителя другому."""
+        url = reverse('posts:index')
+        edit_url = reverse(
+            'posts:post_edit', kwargs={'post_id': self.post.pk})
+        # Кэш прогревает автор поста
+        response = self.authorized_client.get(url)
+        self.assertContains(response, edit_url)
+        Post.objects.filter(pk=self.post.pk).update(text='Новый')
+        response = self.guest_client.get(url)
+        # Гость получает ту же закэшированную ленту, но без кнопки
+        self.assertContains(response, 'Текст')
+        self.assertNotContains(response, 'Новый')
+        self.assertNotContains(response, edit_url)
+        self.assertNotContains(response, '<!--viewer:')
+
+    def test_post_card_shared_between_pages(self):
+        """Карточка поста кэшируется отдельно от страницы."""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Новый')
+        # Новый пост меняет страницу, но не карточки старых постов
+        Post.objects.create(author=self.user, text='Свежий пост')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+        self.assertContains(response, 'Текст')
+        self.assertNotContains(response, 'Новый')
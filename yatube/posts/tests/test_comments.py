@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..comments import get_queue, process_queue
+from ..models import Comment, Post, User
+
+TEMP_QUEUE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(ASYNC_COMMENTS=True, QUEUE_ROOT=TEMP_QUEUE_ROOT)
+class AsyncCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.other_post = Post.objects.create(author=cls.user, text='Другой')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_QUEUE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.addCleanup(shutil.rmtree, TEMP_QUEUE_ROOT, ignore_errors=True)
+
+    def comment(self, post, text, client=None):
+        client = client or self.authorized_client
+        return client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': text}, follow=True)
+
+    def test_comment_queued_not_saved(self):
+        """Комментарий попадает в очередь, а не в базу."""
+        # сессия, пользователь и пост — чтение; в базу пишется только
+        # сессия с ожидающим комментарием (точка сохранения и UPDATE)
+        with self.assertNumQueries(6):
+            self.authorized_client.post(
+                reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+                data={'text': 'В очереди'})
+        self.assertEqual(len(get_queue()), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_author_sees_pending_comment(self):
+        """Автор видит свой комментарий до записи, другие — нет."""
+        response = self.comment(self.post, 'Мой комментарий')
+        self.assertContains(response, 'Мой комментарий')
+        self.assertContains(response, 'публикуется')
+        reader = Client()
+        reader.force_login(self.reader)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertNotContains(reader.get(url), 'Мой комментарий')
+        other_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.other_post.pk})
+        self.assertNotContains(
+            self.authorized_client.get(other_url), 'Мой комментарий')
+
+    def test_back_to_back_comments_pending(self):
+        """Два комментария подряд видны автору и без общего кэша."""
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.pk})
+        self.authorized_client.post(url, data={'text': 'Первый'})
+        self.authorized_client.post(url, data={'text': 'Второй'})
+        # Следующий запрос попал в процесс с пустым кэшем.
+        cache.clear()
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, 'Первый')
+        self.assertContains(response, 'Второй')
+
+    def test_pending_comment_changes_etag(self):
+        """Комментарий из очереди не прячется за ответом 304."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.authorized_client.get(url)['ETag']
+        self.comment(self.post, 'Новый')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый')
+
+    def test_batch_written_once_per_post(self):
+        """Пачка пишется одним bulk_create, счётчики — раз на пост."""
+        for i in range(3):
+            self.comment(self.post, f'Комментарий {i}')
+        self.comment(self.other_post, 'К другому посту')
+        # выборка постов и авторов, вставка и по счётчику на пост
+        # в транзакции — без запросов на каждый комментарий
+        with self.assertNumQueries(7):
+            self.assertEqual(process_queue(), 4)
+        self.assertEqual(len(get_queue()), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        self.assertEqual(
+            list(self.post.comments.values_list('text', flat=True)),
+            [f'Комментарий {i}' for i in range(3)])
+
+    def test_written_comment_leaves_pending(self):
+        """После записи комментарий выводится из базы один раз."""
+        self.comment(self.post, 'Записанный')
+        process_queue()
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, 'Записанный', count=1)
+        self.assertNotContains(response, 'публикуется')
+
+    def test_deleted_post_comments_dropped(self):
+        post = Post.objects.create(author=self.user, text='Удалят')
+        self.comment(post, 'Потерянный')
+        post.delete()
+        self.assertEqual(process_queue(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_worker_command(self):
+        self.comment(self.post, 'Из обработчика')
+        call_command('comment_worker', once=True, stdout=StringIO())
+        self.assertTrue(Comment.objects.filter(text='Из обработчика').exists())
@@ -0,0 +1,125 @@
+import time
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='one',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Текст',
+            group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без рендеринга."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Last-Modified', response)
+                with self.assertTemplateNotUsed('posts/includes/cards/'
+                                                'feed.html'):
+                    repeat = self.revalidate(
+                        self.guest_client, url, response)
+                self.assertEqual(repeat.status_code, 304)
+                self.assertEqual(repeat.content, b'')
+
+    def test_if_modified_since_ignored(self):
+        """Без ETag правка не прячется за 304 по дате свежего поста."""
+        since = http_date(time.time() + 3600)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                Post.objects.filter(pk=self.post.pk).first().save()
+                repeat = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=since)
+                self.assertEqual(repeat.status_code, 200)
+
+    def test_changes_refresh_etag(self):
+        """Новые посты, правки и комментарии меняют ETag."""
+        changes = [
+            lambda: Post.objects.create(
+                author=self.user, text='Новый', group=self.group),
+            lambda: Post.objects.filter(pk=self.post.pk).first().save(),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+        ]
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        for change in changes:
+            with self.subTest(change=change):
+                response = self.guest_client.get(url)
+                change()
+                repeat = self.revalidate(self.guest_client, url, response)
+                self.assertEqual(repeat.status_code, 200)
+
+    def test_group_rename_refreshes_post(self):
+        """Страница поста выводит название группы."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        repeat = self.revalidate(self.guest_client, url, response)
+        self.assertEqual(repeat.status_code, 200)
+        self.assertContains(repeat, 'Новое название')
+
+    def test_etag_per_user(self):
+        """Гость и пользователь не получают чужую версию страницы."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                repeat = self.revalidate(
+                    self.authorized_client, url, response)
+                self.assertEqual(repeat.status_code, 200)
+
+    def test_follow_refreshes_profile(self):
+        """Подписка меняет кнопку и счётчики профиля."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        response = self.authorized_client.get(url)
+        Follow.objects.create(user=self.reader, author=self.user)
+        repeat = self.revalidate(self.authorized_client, url, response)
+        self.assertEqual(repeat.status_code, 200)
+        self.assertTrue(repeat.context['following'])
+
+    def test_missing_object(self):
+        """Для несуществующих страниц валидаторов нет."""
+        urls = [
+            reverse('posts:group_posts', kwargs={'slug': 'none'}),
+            reverse('posts:profile', kwargs={'username': 'none'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
+                self.assertNotIn('ETag', response)
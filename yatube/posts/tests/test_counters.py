@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User, UserCounters
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_posts_count(self):
+        """Счётчик постов автора меняется при создании и удалении."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        Post.objects.create(author=self.user, text='Текст 2')
+        self.assertEqual(self.counters(self.user).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.counters(self.user).posts_count, 1)
+
+    def test_comments_count(self):
+        """Считаются только активные комментарии поста."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        Comment.objects.create(
+            post=post, author=self.reader, text='Скрытый', active=False)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.active = False
+        comment.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counts(self):
+        """Подписка меняет счётчики обоих пользователей."""
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(self.counters(self.user).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.user).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_repair_counters_command(self):
+        """Команда repair_counters исправляет расхождения."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        UserCounters.objects.filter(user=self.user).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        UserCounters.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('repair_counters', stdout=out)
+        self.assertIn('Создано строк счётчиков: 1', out.getvalue())
+        self.assertEqual(self.counters(self.user).posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_pages_without_aggregate_queries(self):
+        """Профиль и пост выводят счётчики без COUNT(*)."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        urls = [
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(url)
+                self.assertContains(response, 'Всего постов')
+                for query in queries:
+                    self.assertNotIn('COUNT(', query['sql'].upper())
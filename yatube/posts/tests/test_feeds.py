@@ -0,0 +1,133 @@
+import time
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='one',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Текст',
+            group=cls.group
+        )
+        cls.other_post = Post.objects.create(author=cls.other, text='Чужой')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def rss_titles(self, url):
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        root = ElementTree.fromstring(response.content)
+        return [item.findtext('title') for item in root.iter('item')]
+
+    def test_rss_items(self):
+        """RSS-ленты содержат посты своей области."""
+        feeds = {
+            reverse('posts:rss'): ['Чужой', 'Текст'],
+            reverse('posts:group_rss', kwargs={'slug': 'one'}): ['Текст'],
+            reverse('posts:profile_rss', kwargs={'username': 'other'}):
+                ['Чужой'],
+        }
+        for url, titles in feeds.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.rss_titles(url), titles)
+
+    def test_atom(self):
+        """Atom-лента автора с его именем."""
+        response = self.guest_client.get(
+            reverse('posts:profile_atom', kwargs={'username': 'auth'}))
+        root = ElementTree.fromstring(response.content)
+        self.assertEqual(root.tag, f'{ATOM}feed')
+        self.assertEqual(
+            root.findtext(f'{ATOM}entry/{ATOM}author/{ATOM}name'),
+            'Лев Толстой')
+
+    def test_missing_object(self):
+        """Лента несуществующей группы или автора — 404."""
+        for url in [
+            reverse('posts:group_rss', kwargs={'slug': 'none'}),
+            reverse('posts:profile_atom', kwargs={'username': 'none'}),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.guest_client.get(url).status_code, 404)
+
+    def test_cached_until_post_changes(self):
+        """Лента берётся из кэша, пока посты области не меняются."""
+        url = reverse('posts:group_rss', kwargs={'slug': 'one'})
+        self.rss_titles(url)
+        with self.assertNumQueries(1):
+            # Только id группы для поколения кэша.
+            self.guest_client.get(url)
+        Post.objects.create(author=self.other, text='Новый')
+        self.assertEqual(self.rss_titles(url), ['Текст'])
+        Post.objects.create(author=self.other, text='В группе',
+                            group=self.group)
+        self.assertEqual(self.rss_titles(url), ['В группе', 'Текст'])
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный'
+        post.save()
+        self.assertEqual(self.rss_titles(url), ['В группе', 'Исправленный'])
+
+    def test_conditional_get(self):
+        """Повторный опрос без изменений получает 304."""
+        url = reverse('posts:rss')
+        response = self.guest_client.get(url)
+        for headers in [
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        ]:
+            with self.subTest(headers=headers):
+                repeat = self.guest_client.get(url, **headers)
+                self.assertEqual(repeat.status_code, 304)
+        Post.objects.create(author=self.user, text='Свежий')
+        repeat = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 200)
+
+    def test_edit_changes_last_modified(self):
+        """Правка поста видна клиенту, который шлёт только
+        If-Modified-Since."""
+        url = reverse('posts:rss')
+        response = self.guest_client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный'
+        post.save()
+        with mock.patch('posts.feeds.time.time', return_value=time.time() + 5):
+            repeat = self.guest_client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(repeat.status_code, 200)
+        self.assertContains(repeat, 'Исправленный')
+
+    def test_pages_link_feeds(self):
+        """Страницы группы и профиля ссылаются на свои ленты."""
+        pages = {
+            reverse('posts:group_posts', kwargs={'slug': 'one'}):
+                reverse('posts:group_rss', kwargs={'slug': 'one'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}):
+                reverse('posts:profile_atom', kwargs={'username': 'auth'}),
+        }
+        for page, feed in pages.items():
+            with self.subTest(page=page):
+                self.assertContains(
+                    self.guest_client.get(page), f'href="{feed}"')
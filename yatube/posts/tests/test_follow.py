@@ -1,7 +1,10 @@
-from django.test import Client, TestCase
+from unittest import mock
+
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Post, User
+from ..models import Follow, Post, TimelineEntry, User
+from ..timeline import rebuild
 
 
 class FollowViewsTest(TestCase):
@@ -121,3 +124,61 @@ class FollowViewsTest(TestCase):
                 author=self.author_2
             ).exists()
         )
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.user_2 = User.objects.create_user(username='auth_2')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def timeline(self, user):
+        return list(TimelineEntry.objects.filter(user=user).values_list(
+            'post_id', flat=True))
+
+    def test_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.timeline(self.user), [post.pk])
+        self.assertEqual(self.timeline(self.user_2), [])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дополняет ленту, отписка очищает её."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(self.timeline(self.user), [post.pk])
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertEqual(self.timeline(self.user), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_read_path(self):
+        """Посты популярного автора подмешиваются при чтении."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user_2, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.timeline(self.user), [])
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        # Автор перестал быть популярным: пропущенный пост дописан.
+        Follow.objects.filter(user=self.user_2).delete()
+        self.assertEqual(self.timeline(self.user), [post.pk])
+
+    def test_failed_rebuild_keeps_timeline(self):
+        """Ошибка при перестроении не оставляет ленту пустой."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        with mock.patch('posts.timeline.backfill', side_effect=OSError):
+            with self.assertRaises(OSError):
+                rebuild(self.user)
+        self.assertEqual(self.timeline(self.user), [post.pk])
+        rebuild(self.user)
+        self.assertEqual(self.timeline(self.user), [post.pk])
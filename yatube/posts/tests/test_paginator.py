@@ -1,10 +1,18 @@
 import math
+from datetime import timedelta
 
 from django.conf import settings
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
 
-from ..models import Group, Post, User
+from ..models import Comment, Group, Post, User
+from ..paginators import (ESTIMATE_THRESHOLD, CountedPaginator,
+                          CursorPaginator, page_window)
 
 
 class PaginatorViewsTest(TestCase):
@@ -105,3 +113,215 @@ class PaginatorViewsTest(TestCase):
             reverse('posts:group_posts', kwargs={'slug': self.group.slug}))
         self.assertNotEqual(
             response.context['page_obj'][0].text, self.post_final.text)
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Текст {i}') for i in range(25)
+        )
+        cls.ordered = list(Post.objects.all())
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.url = reverse('posts:index')
+
+    def test_cursor_pages_follow_ordering(self):
+        """Курсоры ведут по ленте так же, как номера страниц."""
+        response = self.guest_client.get(self.url)
+        page = response.context['page_obj']
+        self.assertEqual(list(page), self.ordered[:settings.PER_PAGE])
+        self.assertIsNone(page.previous_cursor)
+        response = self.guest_client.get(
+            self.url + f'?after={page.next_cursor}')
+        page = response.context['page_obj']
+        self.assertEqual(
+            list(page), self.ordered[settings.PER_PAGE:2 * settings.PER_PAGE])
+        response = self.guest_client.get(
+            self.url + f'?before={page.previous_cursor}')
+        page = response.context['page_obj']
+        self.assertEqual(list(page), self.ordered[:settings.PER_PAGE])
+        self.assertEqual(page.number, 1)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_last_cursor_page(self):
+        """На последней странице нет курсора вперёд."""
+        response = self.guest_client.get(self.url + '?page=2')
+        page = response.context['page_obj']
+        response = self.guest_client.get(
+            self.url + f'?after={page.next_cursor}')
+        page = response.context['page_obj']
+        self.assertEqual(list(page), self.ordered[2 * settings.PER_PAGE:])
+        self.assertIsNone(page.next_cursor)
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        for cursor in ('broken', 'MjAyMS0wMS0wMVQwMDowMDowMHzCsg'):
+            with self.subTest(cursor=cursor):
+                response = self.guest_client.get(self.url + f'?after={cursor}')
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    self.ordered[:settings.PER_PAGE])
+
+    def test_oversized_and_naive_cursors_show_first_page(self):
+        """id вне bigint и время без пояса — испорченный курсор."""
+        paginator = CursorPaginator(Post.objects.all(), settings.PER_PAGE)
+        for raw in ('2021-01-01T00:00:00+00:00|99999999999999999999999',
+                    '2021-01-01T00:00:00|1'):
+            cursor = urlsafe_base64_encode(raw.encode())
+            with self.subTest(raw=raw):
+                self.assertIsNone(paginator.decode_cursor(cursor))
+                for query in ('after', 'before'):
+                    response = self.guest_client.get(
+                        self.url + f'?{query}={cursor}')
+                    self.assertEqual(
+                        list(response.context['page_obj']),
+                        self.ordered[:settings.PER_PAGE])
+
+    def test_nothing_before_cursor_shows_first_page(self):
+        """Пустая выборка перед курсором открывает первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), settings.PER_PAGE)
+        newest = paginator.encode_cursor(self.ordered[0])
+        response = self.guest_client.get(self.url + f'?before={newest}')
+        page = response.context['page_obj']
+        self.assertEqual(list(page), self.ordered[:settings.PER_PAGE])
+        self.assertEqual(page.number, 1)
+        self.assertIsNone(page.previous_cursor)
+        future = urlsafe_base64_encode(
+            f'{timezone.now() + timedelta(days=1):%Y-%m-%dT%H:%M:%S%z}'
+            '|1'.encode())
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse('posts:follow_index') + f'?before={future}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_empty_page_has_no_cursors(self):
+        """Курсоры пустой страницы не вычисляются."""
+        paginator = CursorPaginator(Post.objects.all(), settings.PER_PAGE)
+        page = paginator._make_page([], None, True, True)
+        self.assertIsNone(page.next_cursor)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_cursor_page_without_count_and_offset(self):
+        """Курсорная страница не делает COUNT(*) и OFFSET."""
+        paginator = CursorPaginator(Post.objects.all(), settings.PER_PAGE)
+        cursor = paginator.encode_cursor(self.ordered[15])
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.cursor_page(after=cursor)
+        self.assertEqual(list(page), self.ordered[16:16 + settings.PER_PAGE])
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+
+class CountedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for i in range(3):
+            Post.objects.create(author=cls.user, text=f'Текст {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window_is_constant_size(self):
+        """Окно номеров не растёт с числом страниц."""
+        self.assertEqual(
+            page_window(10, 5000), [1, None, 8, 9, 10, 11, 12, None, 5000])
+        self.assertEqual(page_window(1, 3), [1, 2, 3])
+        self.assertEqual(page_window(2, 6), [1, 2, 3, 4, None, 6])
+
+    def test_count_cached_until_post_created(self):
+        """Число записей берётся из кэша до создания поста."""
+        CountedPaginator(Post.objects.all(), 2, count_key='posts').count
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                CountedPaginator(
+                    Post.objects.all(), 2, count_key='posts').count, 3)
+        Post.objects.create(author=self.user, text='Новый')
+        paginator = CountedPaginator(Post.objects.all(), 2, count_key='posts')
+        self.assertEqual(paginator.count, 4)
+
+    def test_known_total_without_query(self):
+        with self.assertNumQueries(0):
+            paginator = CountedPaginator(Post.objects.all(), 2, total=3)
+            self.assertEqual(paginator.num_pages, 2)
+
+    def test_estimate_for_large_table(self):
+        """Для большой таблицы используется оценка планировщика."""
+        estimate = ESTIMATE_THRESHOLD * 10
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute(
+                'UPDATE sqlite_stat1 SET stat = %s WHERE tbl = %s',
+                [str(estimate), Post._meta.db_table]
+            )
+        paginator = CountedPaginator(Post.objects.all(), 2, estimate=True)
+        self.assertEqual(paginator.count, estimate)
+        paginator = CountedPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 3)
+
+    def test_feed_renders_page_window(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Ещё {i}')
+            for i in range(settings.PER_PAGE)
+        )
+        response = Client().get(reverse('posts:index') + '?page=2')
+        self.assertContains(response, 'href="?page=1"')
+        self.assertContains(response, '<span class="page-link">2</span>')
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(7)
+        ]
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Скрытый', active=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_renders_first_page(self):
+        """На странице поста — только первая страница комментариев."""
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        for comment in self.comments[:3]:
+            self.assertContains(response, comment.text)
+        self.assertNotContains(response, self.comments[3].text)
+        self.assertContains(response, 'data-comments-more')
+
+    def test_fragment_pages_follow_cursor(self):
+        """Фрагменты догружают остальные комментарии по курсору."""
+        client = Client()
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        seen = []
+        page_url = url
+        while page_url:
+            response = client.get(page_url)
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page']
+            seen.extend(page.object_list)
+            page_url = (
+                f'{url}?after={page.next_cursor}'
+                if page.next_cursor else None)
+        self.assertEqual(seen, self.comments)
+
+    def test_fragment_for_missing_post(self):
+        response = Client().get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.queries import QueryProblems, query_budget, query_shape
+
+from ..models import Follow, Group, Post, PostQuerySet, User
+
+
+class FeedQueriesTest(TestCase):
+    """Число запросов страницы ленты не зависит от числа постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='one',
+            description='Тестовое описание',
+        )
+        for i in range(settings.PER_PAGE + 1):
+            author = User.objects.create_user(
+                username=f'author_{i}', first_name='Имя', last_name=str(i))
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-')
+            Post.objects.create(author=author, text=f'Пост {i}', group=group)
+            Post.objects.create(
+                author=cls.user, text=f'Свой пост {i}', group=cls.group)
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_query_budget(self):
+        """Страница ленты укладывается в бюджет запросов."""
+        # сессия, пользователь, выборка страницы, а также группа
+        # или автор со счётчиками для своих лент и популярные авторы
+        # для ленты подписок; при пустом кэше ещё число записей для
+        # номеров страниц (на главной — после попытки взять оценку
+        # из статистики планировщика); перед выборкой ленты — id группы
+        # или автора для ETag
+        budgets = {
+            reverse('posts:index'): 5,
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}): 6,
+            reverse('posts:profile', kwargs={'username': self.user}): 5,
+            reverse('posts:follow_index'): 4,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    response = self.authorized_client.get(url)
+                self.assertEqual(
+                    len(response.context['page_obj']), settings.PER_PAGE)
+
+
+class QueryInspectionTest(TestCase):
+    """Строгий режим тестов ловит N+1 и превышение бюджета."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for i in range(settings.QUERY_REPEAT_LIMIT + 1):
+            author = User.objects.create_user(username=f'author_{i}')
+            Post.objects.create(author=author, text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_query_shape(self):
+        """Форма запроса не зависит от значений параметров."""
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id = 15 AND s = 'a''b'"),
+            'SELECT * FROM t WHERE id = ? AND s = ?')
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT * FROM t WHERE id IN (%s)'))
+
+    def test_n_plus_one_fails(self):
+        """Лента без select_related падает с местом в шаблоне."""
+        with mock.patch.object(
+                PostQuerySet, 'for_feed', lambda queryset: queryset.all()):
+            with self.assertLogs('yatube.queries', 'WARNING'):
+                with self.assertRaises(QueryProblems) as error:
+                    self.guest_client.get(reverse('posts:index'))
+        self.assertIn('posts:index: N+1', str(error.exception))
+        self.assertIn('posts/includes/cards/feed.html', str(error.exception))
+
+    @override_settings(QUERY_INSPECTION_STRICT=False)
+    def test_n_plus_one_logged(self):
+        with mock.patch.object(
+                PostQuerySet, 'for_feed', lambda queryset: queryset.all()):
+            with self.assertLogs('yatube.queries', 'WARNING') as logs:
+                response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('N+1', logs.output[0])
+
+    def test_query_budget(self):
+        url = reverse('posts:index')
+        with query_budget(0), self.assertLogs('yatube.queries', 'WARNING'):
+            with self.assertRaisesMessage(QueryProblems, 'бюджете 0'):
+                self.guest_client.get(url)
+        with query_budget(10):
+            self.assertEqual(self.guest_client.get(url).status_code, 200)
@@ -0,0 +1,140 @@
+import re
+import unittest
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+# Полный проход по таблице (без индекса) и сортировка во временном
+# B-дереве — то, чего не должно быть в запросах лент.
+FULL_SCAN_RE = re.compile(
+    r'^SCAN (TABLE )?(?P<table>\w+)(?!.*\b(USING|INDEX)\b)')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Маленькие служебные таблицы, которые допустимо читать целиком.
+SCAN_ALLOWED = {'django_content_type', 'django_site', 'sqlite_stat1'}
+# Размеры таблиц рабочей базы для статистики планировщика.
+TABLE_ROWS = {
+    'auth_user': 10 ** 5,
+    'posts_usercounters': 10 ** 5,
+    'posts_group': 10 ** 3,
+    'posts_post': 10 ** 6,
+    'posts_comment': 10 ** 7,
+    'posts_follow': 10 ** 6,
+    'posts_timelineentry': 10 ** 7,
+    'posts_thumbnail': 10 ** 6,
+}
+DEFAULT_ROWS = 10 ** 4
+# Сколько строк в среднем приходится на значение первого столбца
+# неуникального индекса.
+ROWS_PER_KEY = 100
+
+
+class CapturedQueries:
+    """Собирает SELECT-запросы с параметрами через execute_wrapper."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def load_statistics():
+    """Подменяет статистику sqlite_stat1 размерами рабочей базы.
+
+    На нескольких тестовых строках планировщик справедливо предпочёл бы
+    читать таблицы целиком, поэтому ему сообщаются размеры TABLE_ROWS.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        cursor.execute('DELETE FROM sqlite_stat1')
+        for table in connection.introspection.table_names(cursor):
+            rows = TABLE_ROWS.get(table, DEFAULT_ROWS)
+            cursor.execute(f'PRAGMA index_list("{table}")')
+            indexes = [(row[1], row[2]) for row in cursor.fetchall()]
+            stats = [(table, None, str(rows))]
+            for name, unique in indexes:
+                cursor.execute(f'PRAGMA index_info("{name}")')
+                per_key = [ROWS_PER_KEY] + [1] * (len(cursor.fetchall()) - 1)
+                if unique:
+                    per_key[-1] = 1
+                stats.append(
+                    (table, name, ' '.join(map(str, [rows, *per_key]))))
+            cursor.executemany(
+                'INSERT INTO sqlite_stat1 (tbl, idx, stat) '
+                'VALUES (%s, %s, %s)',
+                stats
+            )
+        # Перечитать статистику.
+        cursor.execute('ANALYZE sqlite_master')
+
+
+def query_plan(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN для SQLite')
+class QueryPlanTest(TestCase):
+    """Запросы страниц идут по индексам: без полных проходов таблиц
+    и без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='-')
+        posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group)
+            for i in range(settings.PER_PAGE + 2)
+        ]
+        cls.post = posts[0]
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        load_statistics()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def assert_plans_use_indexes(self, url, params=None):
+        captured = CapturedQueries()
+        with connection.execute_wrapper(captured):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(captured.queries)
+        for sql, sql_params in captured.queries:
+            for step in query_plan(sql, sql_params):
+                match = FULL_SCAN_RE.match(step)
+                with self.subTest(url=url, step=step, sql=sql):
+                    self.assertNotIn(TEMP_SORT, step)
+                    if match:
+                        self.assertIn(match.group('table'), SCAN_ALLOWED)
+
+    def test_feed_pages(self):
+        """Ленты, их следующие страницы и страница поста."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            self.assert_plans_use_indexes(url)
+            next_cursor = self.client.get(url).context.get('page_obj')
+            if next_cursor is not None and next_cursor.next_cursor:
+                self.assert_plans_use_indexes(
+                    url, {'after': next_cursor.next_cursor})
@@ -0,0 +1,105 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import filter_queryset, index_text, rebuild
+from ..stemmer import stem
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы слова сводятся к одной основе."""
+        cases = {
+            'книга': 'книг',
+            'книгами': 'книг',
+            'красивейший': 'красив',
+            'вечерами': 'вечер',
+            'Ёлки': 'елк',
+            'Python': 'python',
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.books = Post.objects.create(
+            author=cls.user, text='Читаю книгу о книгах и книгами живу')
+        cls.book = Post.objects.create(
+            author=cls.user, text='Одна книга на полке, рядом кошка')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Пост про погоду')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+
+    def test_finds_word_forms_by_relevance(self):
+        """Поиск находит формы слова, релевантные посты выше."""
+        response = self.search('книги')
+        self.assertEqual(
+            list(response.context['page_obj']), [self.books, self.book])
+
+    def test_all_words_required(self):
+        response = self.search('книга кошки')
+        self.assertEqual(list(response.context['page_obj']), [self.book])
+
+    def test_empty_query(self):
+        response = self.search('')
+        self.assertIsNone(response.context['page_obj'])
+        response = self.search('"*')
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.other.text = 'Погода для чтения книг'
+        self.other.save()
+        self.assertIn(self.other, self.search('книга').context['page_obj'])
+        self.other.delete()
+        self.assertEqual(
+            len(self.search('погода').context['page_obj']), 0)
+
+    def test_results_paginated(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Сад номер {i}')
+            for i in range(settings.PER_PAGE + 2)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.search('сады', page=2)
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         settings.PER_PAGE + 2)
+
+    def test_failed_rebuild_keeps_index(self):
+        """Ошибка посреди перестроения не оставляет индекс пустым."""
+        with mock.patch('posts.search.index_text',
+                        side_effect=[index_text('книга'), OSError]):
+            with self.assertRaises(OSError):
+                rebuild(batch_size=1)
+        self.assertEqual(
+            list(self.search('книги').context['page_obj']),
+            [self.books, self.book])
+
+    def test_admin_search_uses_index(self):
+        found = filter_queryset(Post.objects.all(), 'книгу')
+        self.assertCountEqual(found, [self.books, self.book])
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'книгу'})
+        self.assertEqual(response.context['cl'].result_count, 2)
@@ -0,0 +1,181 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post, Thumbnail, User
+from ..thumbnails import get_queue, process_queue, supported_formats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_QUEUE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name='image.png', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, QUEUE_ROOT=TEMP_QUEUE_ROOT)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_QUEUE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        # TestCase не фиксирует транзакцию: задания ставятся сразу.
+        patcher = mock.patch(
+            'django.db.transaction.on_commit', lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image_file()})
+        return Post.objects.get(text='Пост с картинкой')
+
+    def test_upload_enqueues_thumbnails(self):
+        """Загрузка картинки ставит задание, а не режет её сразу."""
+        post = self.create_post()
+        self.assertEqual(len(get_queue()), 1)
+        self.assertFalse(Thumbnail.objects.filter(post=post).exists())
+        self.assertEqual(process_queue(), 1)
+        sizes = dict(
+            Thumbnail.objects.filter(post=post).values_list(
+                'geometry', 'width'))
+        self.assertEqual(sizes, {
+            '1000': 1000, '200x200': 200, '100x100': 100,
+            '320': 320, '640': 640,
+        })
+        thumb = Thumbnail.objects.get(post=post, geometry='1000')
+        self.assertEqual(thumb.height, 667)
+
+    def test_templates_do_not_open_images(self):
+        """Ленты выводят готовые размеры, не открывая картинки."""
+        post = self.create_post()
+        process_queue()
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        with mock.patch('PIL.Image.open', side_effect=AssertionError):
+            for url in urls:
+                with self.subTest(url=url):
+                    response = self.authorized_client.get(url)
+                    self.assertContains(response, 'thumbnails/')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'width="1000" height="667"')
+
+    def test_replaced_image_waits_for_new_thumbnails(self):
+        """Старые миниатюры не выводятся для новой картинки."""
+        post = self.create_post()
+        process_queue()
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': post.text, 'image': image_file('new.png')})
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'thumbnails/')
+        process_queue()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'thumbnails/')
+
+    def test_replaced_image_thumbnail_files_deleted(self):
+        """Файлы миниатюр заменённой картинки удаляются."""
+        post = self.create_post()
+        process_queue()
+        old = [thumb.image for thumb in Thumbnail.objects.filter(post=post)]
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': post.text, 'image': image_file('new.png')})
+        process_queue()
+        for image in old:
+            self.assertFalse(image.storage.exists(image.name))
+        for thumb in Thumbnail.objects.filter(post=post):
+            self.assertTrue(thumb.image.storage.exists(thumb.image.name))
+        # Повторное задание для той же картинки не удаляет свои файлы.
+        get_queue().put({'post_id': post.pk, 'source': post.image.name})
+        post.refresh_from_db()
+        process_queue()
+        for thumb in Thumbnail.objects.filter(post=post):
+            self.assertTrue(thumb.image.storage.exists(thumb.image.name))
+
+    def test_failed_job_moved_aside(self):
+        """Любая ошибка откладывает задание, обработчик не падает."""
+        post = self.create_post()
+        error = Image.DecompressionBombError('слишком большая')
+        with mock.patch('posts.thumbnails.generate', side_effect=error):
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                self.assertEqual(process_queue(), 1)
+        queue = get_queue()
+        self.assertEqual(len(queue), 0)
+        failed = os.listdir(os.path.join(queue.path, 'failed'))
+        self.assertEqual(len(failed), 1)
+        queue.recover()
+        self.assertEqual(process_queue(), 0)
+        self.assertFalse(Thumbnail.objects.filter(post=post).exists())
+
+    def test_feed_renders_responsive_picture(self):
+        """Лента выводит srcset по ширинам и источники других форматов."""
+        post = self.create_post()
+        process_queue()
+        webp = Thumbnail.objects.get(
+            post=post, geometry='640', format='jpeg')
+        Thumbnail.objects.create(
+            post=post, source=webp.source, geometry='640', format='webp',
+            image='thumbnails/640.webp', width=640, height=427)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(
+            response,
+            '<source type="image/webp" srcset="/media/thumbnails/640.webp'
+            ' 640w"'
+        )
+        jpeg = Thumbnail.objects.get(
+            post=post, geometry='320', format='jpeg')
+        self.assertContains(response, f'{jpeg.image.url} 320w')
+
+    def test_unsupported_formats_are_skipped(self):
+        """Форматы, которые не умеет сохранять Pillow, не создаются."""
+        with mock.patch.dict('PIL.Image.SAVE', clear=True):
+            self.assertEqual(supported_formats(), ['jpeg'])
+        with mock.patch.dict('PIL.Image.SAVE', {'WEBP': None, 'JPEG': None}):
+            self.assertEqual(supported_formats(), ['webp', 'jpeg'])
+
+    def test_bench_images_reports_bytes_per_page(self):
+        """Бенчмарк показывает, что узкому экрану хватает меньшей картинки."""
+        self.create_post()
+        process_queue()
+        out = StringIO()
+        call_command(
+            'bench_images', '--viewport', '320', '--accept', 'jpeg',
+            stdout=out)
+        lines = dict(
+            line.rsplit(None, 4)[:2] for line in out.getvalue().splitlines()
+            if 'КБ' in line
+        )
+        self.assertLess(
+            float(lines['<picture>, экран 320px']),
+            float(lines['JPEG 1000px'])
+        )
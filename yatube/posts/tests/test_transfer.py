@@ -0,0 +1,221 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from ..models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                      UserCounters)
+from ..search import search
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_QUEUE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def snapshot():
+    return {
+        'posts': list(Post.objects.order_by('pk').values_list(
+            'pk', 'author__username', 'group__slug', 'text', 'pub_date',
+            'image', 'comments_count')),
+        'comments': list(Comment.objects.order_by('pk').values_list(
+            'pk', 'post_id', 'author__username', 'text', 'created',
+            'active')),
+        'follows': sorted(Follow.objects.values_list(
+            'user__username', 'author__username')),
+        'groups': list(Group.objects.order_by('slug').values_list(
+            'slug', 'title', 'description')),
+    }
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, QUEUE_ROOT=TEMP_QUEUE_ROOT)
+class TransferTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_QUEUE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.author = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='one', description='Описание')
+        post = Post(author=self.author, text='С картинкой', group=group)
+        post.image.save('picture.jpg', ContentFile(b'jpeg'), save=False)
+        post.save()
+        for i in range(5):
+            Post.objects.create(
+                author=self.author, text=f'Пост, "{i}"\nвторая строка')
+        for i in range(3):
+            Comment.objects.create(
+                post=post, author=self.reader, text=f'Комментарий {i}',
+                active=i != 1)
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def clear(self):
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+
+    def round_trip(self, file_format):
+        before = snapshot()
+        call_command(
+            'export_data', self.directory, format=file_format, chunk_size=2,
+            stdout=StringIO())
+        self.clear()
+        call_command(
+            'import_data', self.directory, format=file_format, batch_size=2,
+            stdout=StringIO())
+        self.assertEqual(snapshot(), before)
+
+    def test_jsonl_round_trip(self):
+        """Выгрузка и загрузка сохраняют строки, даты и картинки."""
+        self.round_trip('jsonl')
+        post = Post.objects.exclude(image='').get()
+        with post.image.open() as image:
+            self.assertEqual(image.read(), b'jpeg')
+        self.assertEqual(post.comments_count, 2)
+
+    def test_csv_round_trip(self):
+        self.round_trip('csv')
+
+    def test_export_resumes_after_checkpoint(self):
+        """Недописанный хвост файла отбрасывается, выгрузка продолжается."""
+        call_command(
+            'export_data', self.directory, chunk_size=2, stdout=StringIO())
+        checkpoint_path = os.path.join(self.directory, 'export.checkpoint')
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        posts_path = os.path.join(self.directory, 'posts.jsonl')
+        with open(posts_path, 'rb') as posts_file:
+            lines = posts_file.readlines()
+        # Прервались после двух порций, посреди записи третьей.
+        offset = len(b''.join(lines[:4]))
+        with open(posts_path, 'wb') as posts_file:
+            posts_file.write(b''.join(lines[:4]) + b'{"id": 5, "te')
+        last_pk = json.loads(lines[3])['id']
+        checkpoint['posts'] = {
+            'rows': 4, 'done': False, 'offset': offset, 'last_pk': last_pk}
+        for table in ('comments', 'follows'):
+            del checkpoint[table]
+        with open(checkpoint_path, 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        call_command(
+            'export_data', self.directory, chunk_size=2, stdout=StringIO())
+        with open(posts_path, 'rb') as posts_file:
+            self.assertEqual(posts_file.readlines(), lines)
+
+    def test_import_resumes_after_failure(self):
+        """Прерванная загрузка продолжается без дублей."""
+        before = snapshot()
+        call_command('export_data', self.directory, stdout=StringIO())
+        self.clear()
+        original = Comment.objects.bulk_create
+        calls = []
+
+        def failing_bulk_create(objs, **kwargs):
+            calls.append(objs)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return original(objs, **kwargs)
+
+        with mock.patch.object(
+                Comment.objects, 'bulk_create', failing_bulk_create):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    'import_data', self.directory, batch_size=2,
+                    stdout=StringIO())
+        self.assertEqual(Comment.objects.count(), 2)
+        call_command(
+            'import_data', self.directory, batch_size=2, stdout=StringIO())
+        self.assertEqual(snapshot(), before)
+
+    def test_import_twice(self):
+        """Повторная загрузка узнаёт свои строки и не меняет данных."""
+        before = snapshot()
+        call_command('export_data', self.directory, stdout=StringIO())
+        self.clear()
+        for checkpoint in ('first', 'second'):
+            call_command(
+                'import_data', self.directory, batch_size=2,
+                checkpoint=os.path.join(self.directory, checkpoint),
+                stdout=StringIO())
+        self.assertEqual(snapshot(), before)
+
+    def test_taken_ids_refused(self):
+        """Занятые другими постами id не теряют строк и не отдают
+        комментарии чужому посту."""
+        pks = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        call_command('export_data', self.directory, stdout=StringIO())
+        self.clear()
+        for i, pk in enumerate(pks[:3]):
+            Post.objects.create(pk=pk, author=self.reader, text=f'Местный {i}')
+        with self.assertRaisesMessage(CommandError, 'posts: id'):
+            call_command('import_data', self.directory, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            [f'Местный {i}' for i in range(3)])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Group.objects.exists())
+
+    def test_import_updates_derived_data_of_its_rows(self):
+        """Счётчики, ленты и индекс обновляются только для строк
+        загрузки."""
+        call_command('export_data', self.directory, stdout=StringIO())
+        self.clear()
+        other = User.objects.create_user(username='other')
+        UserCounters.objects.create(user=other, posts_count=5)
+        call_command(
+            'import_data', self.directory, batch_size=2, stdout=StringIO())
+        pks = set(Post.objects.values_list('pk', flat=True))
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.reader).values_list(
+                'post_id', flat=True)), pks)
+        self.assertEqual(
+            UserCounters.objects.filter(user=self.author).values_list(
+                'posts_count', 'followers_count').get(), (6, 1))
+        self.assertEqual(
+            UserCounters.objects.get(user=self.reader).following_count, 1)
+        self.assertEqual(len(search('картинкой')), 1)
+        # Чужие счётчики не пересчитываются.
+        self.assertEqual(UserCounters.objects.get(user=other).posts_count, 5)
+
+    def test_failed_derived_update_rolls_back_batch(self):
+        """Порция записывается вместе со своими производными данными."""
+        call_command('export_data', self.directory, stdout=StringIO())
+        self.clear()
+        with mock.patch('posts.search.index_posts', side_effect=OSError):
+            with self.assertRaises(OSError):
+                call_command('import_data', self.directory, stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_unknown_users_skipped_or_created(self):
+        call_command('export_data', self.directory, stdout=StringIO())
+        self.clear()
+        User.objects.filter(username='reader').delete()
+        stdout = StringIO()
+        call_command('import_data', self.directory, stdout=stdout)
+        self.assertIn('comments: 0 строк', stdout.getvalue())
+        self.assertIn('пропущено 3', stdout.getvalue())
+        self.assertFalse(Comment.objects.exists())
+        call_command(
+            'import_data', self.directory, create_users=True,
+            checkpoint=os.path.join(self.directory, 'again.checkpoint'),
+            stdout=StringIO())
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_missing_directory(self):
+        with self.assertRaises(CommandError):
+            call_command('import_data', os.path.join(self.directory, 'no'))
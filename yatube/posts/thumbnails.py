@@ -0,0 +1,247 @@
+"""Генерация миниатюр картинок постов в фоновом обработчике.
+
+Представления только ставят задание в очередь (enqueue); обработчик
+(manage.py thumbnail_worker) режет картинку под все размеры из
+POST_THUMBNAIL_GEOMETRIES и ширины POST_IMAGE_WIDTHS в каждом формате
+из POST_IMAGE_FORMATS, который умеет сохранять Pillow, и записывает
+размеры в базу. Шаблоны читают готовые миниатюры из базы и не открывают
+файлы.
+"""
+import hashlib
+import logging
+import os
+import time
+from collections import namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from PIL import Image
+
+from core.queue import FileQueue
+
+from .cache import bump, post_scopes
+from .models import Post, Thumbnail
+
+logger = logging.getLogger(__name__)
+
+ImageFormat = namedtuple('ImageFormat', 'pil_name extension mime options')
+
+# JPEG — запасной формат для <img>, поэтому создаётся всегда.
+FALLBACK_FORMAT = 'jpeg'
+FORMATS = {
+    'avif': ImageFormat('AVIF', 'avif', 'image/avif', {'quality': 50}),
+    'webp': ImageFormat(
+        'WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpeg': ImageFormat(
+        'JPEG', 'jpg', 'image/jpeg', {'quality': 85, 'progressive': True}),
+}
+
+
+def get_queue():
+    return FileQueue(os.path.join(settings.QUEUE_ROOT, 'thumbnails'))
+
+
+def enqueue(post):
+    """Ставит в очередь генерацию миниатюр картинки поста.
+
+    Задание ставится после фиксации транзакции: обработчик не возьмёт
+    пост, которого ещё нет в базе, а откаченный пост не оставит задания.
+    """
+    if post.image:
+        job = {'post_id': post.pk, 'source': post.image.name}
+        transaction.on_commit(lambda: get_queue().put(job))
+
+
+def geometries():
+    """Все размеры миниатюр: для шаблонов и для srcset."""
+    result = list(settings.POST_THUMBNAIL_GEOMETRIES)
+    for width in settings.POST_IMAGE_WIDTHS:
+        if str(width) not in result:
+            result.append(str(width))
+    return result
+
+
+def supported_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые Pillow умеет сохранять."""
+    Image.init()
+    result = [
+        name for name in settings.POST_IMAGE_FORMATS
+        if FORMATS[name].pil_name in Image.SAVE
+    ]
+    if FALLBACK_FORMAT not in result:
+        result.append(FALLBACK_FORMAT)
+    return result
+
+
+def parse_geometry(geometry):
+    """'1000' -> (1000, None), '200x200' -> (200, 200)."""
+    width, _, height = geometry.partition('x')
+    return int(width), int(height) if height else None
+
+
+def resize(image, geometry):
+    """Уменьшает картинку: по ширине или с обрезкой по центру.
+
+    Картинки меньше нужного размера не увеличиваются.
+    """
+    width, height = parse_geometry(geometry)
+    if height is None:
+        factor = min(1, width / image.width)
+        size = (
+            max(1, round(image.width * factor)),
+            max(1, round(image.height * factor)),
+        )
+        return image.resize(size, Image.LANCZOS)
+    factor = min(1, max(width / image.width, height / image.height))
+    image = image.resize(
+        (
+            max(1, round(image.width * factor)),
+            max(1, round(image.height * factor)),
+        ),
+        Image.LANCZOS
+    )
+    box_width = min(width, image.width)
+    box_height = min(height, image.height)
+    left = (image.width - box_width) // 2
+    top = (image.height - box_height) // 2
+    return image.crop((left, top, left + box_width, top + box_height))
+
+
+def thumbnail_name(post_id, source, geometry, image_format=FALLBACK_FORMAT):
+    digest = hashlib.md5(source.encode()).hexdigest()[:8]
+    extension = FORMATS[image_format].extension
+    return f'thumbnails/{post_id}/{geometry}-{digest}.{extension}'
+
+
+def generate(post_id, source, media_root, geometries, formats):
+    """Создаёт файлы миниатюр; выполняется в процессе пула.
+
+    Не обращается к базе: возвращает описания созданных файлов.
+    """
+    results = []
+    with Image.open(os.path.join(media_root, source)) as original:
+        original = original.convert('RGB')
+        for geometry in geometries:
+            thumb = resize(original, geometry)
+            for image_format in formats:
+                started = time.perf_counter()
+                name = thumbnail_name(post_id, source, geometry, image_format)
+                path = os.path.join(media_root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                thumb.save(
+                    path,
+                    FORMATS[image_format].pil_name,
+                    **FORMATS[image_format].options
+                )
+                results.append({
+                    'geometry': geometry,
+                    'format': image_format,
+                    'image': name,
+                    'width': thumb.width,
+                    'height': thumb.height,
+                    'seconds': time.perf_counter() - started,
+                })
+    return results
+
+
+def _delete_files(images):
+    for image in images:
+        image.storage.delete(image.name)
+
+
+def store(post_id, source, results):
+    """Сохраняет миниатюры, если у поста всё ещё та же картинка.
+
+    Файлы прежних миниатюр (например, заменённой картинки) удаляются
+    вместе со строками.
+    """
+    with transaction.atomic():
+        post = Post.objects.filter(pk=post_id, image=source).only(
+            'pk', 'author_id', 'group_id').first()
+        if post is None:
+            return False
+        old = Thumbnail.objects.filter(post_id=post_id)
+        names = {result['image'] for result in results}
+        stale = [thumb.image for thumb in old if thumb.image.name not in names]
+        old.delete()
+        Thumbnail.objects.bulk_create(
+            Thumbnail(
+                post_id=post_id,
+                source=source,
+                geometry=result['geometry'],
+                format=result['format'],
+                image=result['image'],
+                width=result['width'],
+                height=result['height'],
+            )
+            for result in results
+        )
+        # Файлы удаляются, только если строки действительно удалены.
+        transaction.on_commit(partial(_delete_files, stale))
+    # Карточки и ленты с постом нужно пересобрать уже с миниатюрами.
+    bump(*post_scopes(post))
+    return True
+
+
+def process_queue(executor=None, batch_size=20):
+    """Обрабатывает задания очереди; возвращает их число.
+
+    Без executor миниатюры генерируются в текущем процессе.
+    """
+    queue = get_queue()
+    sizes = geometries()
+    formats = supported_formats()
+    processed = 0
+    while True:
+        jobs = queue.claim(batch_size)
+        if not jobs:
+            return processed
+        args = [
+            (
+                job.payload['post_id'],
+                job.payload['source'],
+                settings.MEDIA_ROOT,
+                sizes,
+                formats,
+            )
+            for job in jobs
+        ]
+        if executor is None:
+            outcomes = [_run(generate, *job_args) for job_args in args]
+        else:
+            futures = [
+                executor.submit(generate, *job_args) for job_args in args]
+            outcomes = [_result(future) for future in futures]
+        for job, outcome in zip(jobs, outcomes):
+            if outcome is None:
+                # Битые, удалённые и слишком большие картинки повторно
+                # не обрабатываем, но задание остаётся в failed/.
+                queue.fail(job)
+            else:
+                store(job.payload['post_id'], job.payload['source'], outcome)
+                logger.info(
+                    'Миниатюры поста %s готовы за %.3f с',
+                    job.payload['post_id'],
+                    sum(result['seconds'] for result in outcome))
+                queue.ack(job)
+            processed += 1
+
+
+def _run(function, *args):
+    # Любая ошибка (в том числе Image.DecompressionBombError) губит
+    # только своё задание: иначе после recover() обработчик падал бы
+    # на нём снова и снова.
+    try:
+        return function(*args)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', args[1])
+        return None
+
+
+def _result(future):
+    try:
+        return future.result()
+    except Exception:
+        logger.exception('Не удалось создать миниатюры')
+        return None
@@ -0,0 +1,175 @@
+"""Лента подписок с раскладкой постов при записи (fan-out on write).
+
+При публикации пост копируется в TimelineEntry каждого подписчика
+автора; при подписке лента дополняется постами автора, при отписке —
+очищается от них. Для авторов с числом подписчиков больше
+TIMELINE_FANOUT_LIMIT раскладка не делается: их посты подмешиваются
+в ленту при чтении.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Follow, Post, PostQuerySet, TimelineEntry, UserCounters
+from .paginators import CursorPaginator
+
+BATCH_SIZE = 1000
+
+
+def followers_count(author_id):
+    count = UserCounters.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    return count or 0
+
+
+def is_celebrity(author_id):
+    return followers_count(author_id) > settings.TIMELINE_FANOUT_LIMIT
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку новых постов по лентам подписчиков авторов."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    celebrities = UserCounters.objects.filter(
+        user_id__in=list(by_author),
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True)
+    followers = Follow.objects.filter(
+        author_id__in=set(by_author) - set(celebrities)).values_list(
+            'author_id', 'user_id')
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=author_id,
+            pub_date=post.pub_date,
+        )
+        for author_id, user_id in followers.iterator()
+        for post in by_author[author_id]
+    )
+
+
+def backfill(user_ids, author_id):
+    """Добавляет все посты автора в ленты пользователей user_ids."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by().values_list(
+        'pk', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+        for user_id in user_ids
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя посты автора."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user):
+    """Собирает ленту пользователя заново по его подпискам.
+
+    Удаление и вставка идут в одной транзакции: до её завершения
+    и при ошибке /follow/ показывает прежнюю ленту, а не пустую.
+    """
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user=user).delete()
+        authors = Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True)
+        for author_id in authors:
+            backfill([user.pk], author_id)
+
+
+def author_unfollowed(user_id, author_id):
+    """Чистит ленту отписавшегося и обрабатывает выход из «популярных».
+
+    Пока у автора было больше TIMELINE_FANOUT_LIMIT подписчиков, его посты
+    не раскладывались; когда их стало ровно столько, ленты оставшихся
+    подписчиков дополняются пропущенными постами.
+    """
+    prune(user_id, author_id)
+    if followers_count(author_id) == settings.TIMELINE_FANOUT_LIMIT:
+        followers = list(
+            Follow.objects.filter(author_id=author_id).values_list(
+                'user_id', flat=True)
+        )
+        backfill(followers, author_id)
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорный пагинатор по записям ленты, отдающий сами посты."""
+    ordering = ('-pub_date', '-post_id')
+
+    def transform(self, objects):
+        return [entry.post for entry in objects]
+
+
+def followed_celebrities(user):
+    """Популярные авторы, на которых подписан user: их посты
+    не разложены по лентам."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__counters__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def follow_page(request):
+    """Страница ленты подписок текущего пользователя."""
+    user = request.user
+    celebrities = followed_celebrities(user)
+    if not celebrities:
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group').defer(
+                *[f'post__{field}'
+                  for field in PostQuerySet.FEED_DEFERRED_FIELDS])
+        paginator = TimelinePaginator(entries, settings.PER_PAGE)
+    else:
+        # Гибридное чтение: разложенные записи плюс посты популярных
+        # авторов прямо из таблицы постов.
+        posts = Post.objects.for_feed().filter(
+            Q(author_id__in=celebrities)
+            | Q(pk__in=TimelineEntry.objects.filter(
+                user=user).values('post_id'))
+        )
+        paginator = CursorPaginator(posts, settings.PER_PAGE)
+    return paginator.page_from_request(request)
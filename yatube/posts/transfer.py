@@ -0,0 +1,519 @@
+"""Перенос групп, постов, комментариев и подписок между окружениями.
+
+manage.py export_data пишет в каталог по файлу на таблицу (JSON Lines
+или CSV) и копирует рядом, в media/, картинки постов; manage.py
+import_data загружает такой каталог. Строки читаются из базы порциями
+по ключу (pk > последнего), а из файла — потоком, и записываются через
+bulk_create, поэтому память не зависит от объёма данных.
+
+Посты и комментарии сохраняют свои pk, а пользователи и группы
+задаются именем и slug. Если pk уже занят другой строкой, загрузка не
+начинается (файлы сначала проверяются целиком): иначе строка пропала
+бы, а её комментарии достались бы чужому посту. Поэтому загружать
+нужно в базу, где таких pk нет (обычно пустую); строки, совпавшие по
+автору и дате, считаются уже загруженными и пропускаются.
+
+Строки с неизвестными пользователями пропускаются, если не попросить
+создать таких пользователей (без пароля: войти они смогут после сброса
+пароля). После каждой порции в файл контрольной точки записывается,
+докуда дошли, и прерванная команда продолжает с этого места; повторная
+запись порции не создаёт дублей.
+
+bulk_create обходит сигналы, поэтому в транзакции порции обновляются и
+денормализованные данные её строк: счётчики авторов, постов и
+подписчиков, ленты подписчиков и поисковый индекс. Остальная база не
+пересчитывается, и читатели не видят её частично перестроенной.
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search, thumbnails, timeline
+from .cache import bump, invalidate_counts
+from .counters import repair_counters
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+# Порядок важен: строки ссылаются на строки предыдущих таблиц.
+TABLES = ('groups', 'posts', 'comments', 'follows')
+MEDIA_DIR = 'media'
+# Колонка файла и путь к значению в values().
+COLUMNS = {
+    'groups': {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    },
+    'posts': {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comments': {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+        'active': 'active',
+    },
+    'follows': {
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+# Колонки, по которым строка файла узнаётся в базе, если её pk занят.
+IDENTITY = {
+    'posts': ('author', 'pub_date'),
+    'comments': ('post', 'author', 'created'),
+}
+MODELS = {
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+
+
+class Checkpoint:
+    """Состояние переноса по таблицам в JSON-файле."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tables = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as checkpoint_file:
+                self.tables = json.load(checkpoint_file)
+
+    def get(self, table):
+        return self.tables.setdefault(table, {'rows': 0, 'done': False})
+
+    def save(self):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump(self.tables, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(tmp, self.path)
+
+
+class Progress:
+    """Число строк и скорость, не чаще раза в interval секунд."""
+
+    def __init__(self, table, report, interval=5.0):
+        self.table = table
+        self.report = report
+        self.interval = interval
+        self.rows = 0
+        self.skipped = 0
+        self.started = self.reported = time.monotonic()
+
+    def add(self, rows, skipped=0):
+        self.rows += rows
+        self.skipped += skipped
+        now = time.monotonic()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            self.report(self.line())
+
+    def line(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        line = (f'{self.table}: {self.rows} строк, '
+                f'{self.rows / elapsed:.0f} строк/с')
+        if self.skipped:
+            line += f', пропущено {self.skipped}'
+        return line
+
+
+def _file_path(directory, table, file_format):
+    return os.path.join(directory, f'{table}.{file_format}')
+
+
+def _plain(value):
+    # DjangoJSONEncoder округляет время до миллисекунд.
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode(rows, columns, file_format, header):
+    buffer = io.StringIO()
+    if file_format == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        if header:
+            writer.writeheader()
+        for row in rows:
+            writer.writerow({
+                column: '' if value is None else _plain(value)
+                for column, value in row.items()
+            })
+    else:
+        for row in rows:
+            buffer.write(json.dumps(
+                {column: _plain(value) for column, value in row.items()},
+                ensure_ascii=False))
+            buffer.write('\n')
+    return buffer.getvalue().encode()
+
+
+def _copy_from_storage(name, media):
+    target = os.path.join(media, name)
+    if os.path.exists(target) or not default_storage.exists(name):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with default_storage.open(name) as source, open(target, 'wb') as copy:
+        shutil.copyfileobj(source, copy)
+
+
+def _copy_to_storage(name, media):
+    source = os.path.join(media, name)
+    if default_storage.exists(name) or not os.path.exists(source):
+        return
+    with open(source, 'rb') as source_file:
+        default_storage.save(name, File(source_file))
+
+
+def export_table(directory, table, file_format, checkpoint, chunk_size,
+                 images=True, report=print):
+    """Дописывает в файл таблицы строки после контрольной точки."""
+    state = checkpoint.get(table)
+    if state['done']:
+        return state['rows']
+    columns = COLUMNS[table]
+    queryset = MODELS[table].objects.order_by('pk').values(
+        'pk', *[lookup for lookup in columns.values() if lookup != 'pk'])
+    progress = Progress(table, report)
+    path = _file_path(directory, table, file_format)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as data_file:
+        # Хвост после контрольной точки — недописанная порция.
+        offset = state.get('offset', 0)
+        data_file.truncate(offset)
+        data_file.seek(offset)
+        while True:
+            chunk = list(queryset.filter(
+                pk__gt=state.get('last_pk', 0))[:chunk_size])
+            if not chunk:
+                break
+            rows = [
+                {column: values[lookup] for column, lookup in columns.items()}
+                for values in chunk
+            ]
+            if images and table == 'posts':
+                for row in rows:
+                    if row['image']:
+                        _copy_from_storage(
+                            row['image'], os.path.join(directory, MEDIA_DIR))
+            data_file.write(_encode(
+                rows, list(columns), file_format, header=not offset))
+            data_file.flush()
+            os.fsync(data_file.fileno())
+            offset = data_file.tell()
+            state.update(
+                offset=offset, last_pk=chunk[-1]['pk'],
+                rows=state['rows'] + len(rows))
+            checkpoint.save()
+            progress.add(len(rows))
+    state['done'] = True
+    checkpoint.save()
+    report(progress.line())
+    return state['rows']
+
+
+def export_data(directory, file_format='jsonl', chunk_size=2000,
+                images=True, checkpoint_path=None, report=print):
+    os.makedirs(directory, exist_ok=True)
+    checkpoint = Checkpoint(
+        checkpoint_path or os.path.join(directory, 'export.checkpoint'))
+    return {
+        table: export_table(
+            directory, table, file_format, checkpoint, chunk_size, images,
+            report)
+        for table in TABLES
+    }
+
+
+def _read_rows(path, file_format):
+    with open(path, encoding='utf-8', newline='') as data_file:
+        if file_format == 'csv':
+            yield from csv.DictReader(data_file)
+        else:
+            for line in data_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _date(value):
+    return value if not isinstance(value, str) else parse_datetime(value)
+
+
+def _bool(value):
+    return value if isinstance(value, bool) else value == 'True'
+
+
+def _lookup(model, field, values):
+    """{значение поля: pk} для значений одной порции."""
+    return dict(model.objects.filter(**{f'{field}__in': values}).values_list(
+        field, 'pk'))
+
+
+def _users(names, create):
+    names = {name for name in names if name}
+    users = _lookup(User, 'username', names)
+    missing = names - set(users)
+    if create and missing:
+        User.objects.bulk_create(
+            (User(username=name, password=make_password(None))
+             for name in missing),
+            ignore_conflicts=True)
+        users.update(_lookup(User, 'username', missing))
+    return users
+
+
+def _groups(rows, create_users):
+    return [
+        Group(slug=row['slug'], title=row['title'],
+              description=row['description'])
+        for row in rows
+    ]
+
+
+def _posts(rows, create_users):
+    users = _users((row['author'] for row in rows), create_users)
+    groups = _lookup(Group, 'slug', {row['group'] for row in rows})
+    return [
+        Post(pk=int(row['id']), author_id=users[row['author']],
+             group_id=groups.get(row['group']), text=row['text'],
+             pub_date=_date(row['pub_date']), image=row['image'] or '')
+        for row in rows if row['author'] in users
+    ]
+
+
+def _comments(rows, create_users):
+    users = _users((row['author'] for row in rows), create_users)
+    posts = set(Post.objects.filter(
+        pk__in={int(row['post']) for row in rows}).order_by().values_list(
+        'pk', flat=True))
+    return [
+        Comment(pk=int(row['id']), post_id=int(row['post']),
+                author_id=users[row['author']], text=row['text'],
+                created=_date(row['created']), active=_bool(row['active']))
+        for row in rows
+        if row['author'] in users and int(row['post']) in posts
+    ]
+
+
+def _follows(rows, create_users):
+    users = _users(
+        (name for row in rows for name in (row['user'], row['author'])),
+        create_users)
+    return [
+        Follow(user_id=users[row['user']], author_id=users[row['author']])
+        for row in rows
+        if row['user'] in users and row['author'] in users
+        and row['user'] != row['author']
+    ]
+
+
+def _identity_value(column, value):
+    if column in ('pub_date', 'created'):
+        return _date(value)
+    if column == 'post':
+        return int(value)
+    return value
+
+
+def _loaded(table, rows):
+    """pk строк порции, которые уже есть в базе.
+
+    Так находятся строки, записанные до прерывания или прошлым запуском.
+    Если pk занят другой строкой, выбрасывается ValueError.
+    """
+    columns = IDENTITY.get(table)
+    if not columns:
+        return set()
+    rows = {int(row['id']): row for row in rows}
+    existing = MODELS[table].objects.filter(pk__in=list(rows)).values_list(
+        'pk', *[COLUMNS[table][column] for column in columns])
+    loaded = set()
+    for pk, *values in existing:
+        expected = [
+            _identity_value(column, rows[pk][column]) for column in columns
+        ]
+        if values != expected:
+            raise ValueError(
+                f'{table}: id {pk} уже занят другой строкой; '
+                f'загружайте данные в базу без таких записей')
+        loaded.add(pk)
+    return loaded
+
+
+BUILDERS = {
+    'groups': _groups,
+    'posts': _posts,
+    'comments': _comments,
+    'follows': _follows,
+}
+
+
+def _posts_derived(posts):
+    counters.recount(user_ids={post.author_id for post in posts})
+    timeline.fan_out_many(posts)
+    if search.available():
+        search.index_posts(posts)
+
+
+def _comments_derived(comments):
+    counters.recount(post_ids={comment.post_id for comment in comments})
+
+
+def _follows_derived(follows):
+    counters.recount(user_ids={
+        user_id for follow in follows
+        for user_id in (follow.user_id, follow.author_id)
+    })
+    followers = defaultdict(list)
+    for follow in follows:
+        followers[follow.author_id].append(follow.user_id)
+    for author_id, user_ids in followers.items():
+        timeline.backfill(user_ids, author_id)
+
+
+# Денормализованные данные, которые bulk_create обходит вместе
+# с сигналами: обновляются только для строк порции.
+DERIVED = {
+    'posts': _posts_derived,
+    'comments': _comments_derived,
+    'follows': _follows_derived,
+}
+
+
+@contextmanager
+def original_dates(*models):
+    """bulk_create сохраняет даты из файла, а не время загрузки."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def check_ids(directory, file_format, checkpoint, batch_size):
+    """До записи проверяет pk постов и комментариев всех файлов.
+
+    Если pk занят другой строкой, выбрасывается ValueError.
+    """
+    for table in IDENTITY:
+        path = _file_path(directory, table, file_format)
+        if checkpoint.get(table)['done'] or not os.path.exists(path):
+            continue
+        for batch in _batches(_read_rows(path, file_format), batch_size):
+            _loaded(table, batch)
+
+
+def import_table(directory, table, file_format, checkpoint, batch_size,
+                 images=True, create_users=False, report=print):
+    """Загружает файл таблицы с места контрольной точки."""
+    state = checkpoint.get(table)
+    path = _file_path(directory, table, file_format)
+    if state['done'] or not os.path.exists(path):
+        return state['rows']
+    progress = Progress(table, report)
+    rows = islice(_read_rows(path, file_format), state['rows'], None)
+    media = os.path.join(directory, MEDIA_DIR)
+    with original_dates(MODELS[table]):
+        for batch in _batches(rows, batch_size):
+            loaded = _loaded(table, batch)
+            objects = [
+                obj for obj in BUILDERS[table](batch, create_users)
+                if obj.pk not in loaded
+            ]
+            with transaction.atomic():
+                # Конфликты групп и подписок — строки, записанные
+                # до прерывания.
+                MODELS[table].objects.bulk_create(
+                    objects, ignore_conflicts=True)
+                if objects and table in DERIVED:
+                    DERIVED[table](objects)
+            if table == 'posts':
+                for post in objects:
+                    if images and post.image:
+                        _copy_to_storage(post.image.name, media)
+                    thumbnails.enqueue(post)
+            state['rows'] += len(batch)
+            checkpoint.save()
+            progress.add(len(objects), len(batch) - len(objects))
+    state['done'] = True
+    checkpoint.save()
+    report(progress.line())
+    return state['rows']
+
+
+def reset_sequences():
+    """Счётчики pk после вставки строк с явными pk (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), list(MODELS.values()))
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_derived():
+    """Денормализованные данные всей базы после bulk_create, который
+    обходит сигналы: счётчики, ленты подписок, поиск и кэш."""
+    repair_counters()
+    followers = User.objects.filter(
+        pk__in=Follow.objects.values('user_id')).order_by('pk')
+    for user in followers.iterator():
+        timeline.rebuild(user)
+    if search.available():
+        search.rebuild()
+    bump('posts', 'users', 'groups')
+    invalidate_counts('posts')
+
+
+def import_data(directory, file_format='jsonl', batch_size=1000,
+                images=True, create_users=False, checkpoint_path=None,
+                report=print):
+    checkpoint = Checkpoint(
+        checkpoint_path or os.path.join(directory, 'import.checkpoint'))
+    check_ids(directory, file_format, checkpoint, batch_size)
+    result = {
+        table: import_table(
+            directory, table, file_format, checkpoint, batch_size, images,
+            create_users, report)
+        for table in TABLES
+    }
+    reset_sequences()
+    bump('posts', 'users', 'groups')
+    invalidate_counts('posts')
+    return result
@@ -1,7 +1,7 @@
 # posts/urls.py
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
@@ -9,15 +9,32 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug>/', views.group_posts, name='group_posts'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    # Ленты RSS и Atom
+    path('rss/', feeds.site_rss, name='rss'),
+    path('atom/', feeds.site_atom, name='atom'),
+    path('group/<slug>/rss/', feeds.group_rss, name='group_rss'),
+    path('group/<slug>/atom/', feeds.group_atom, name='group_atom'),
+    path('profile/<str:username>/rss/', feeds.author_rss, name='profile_rss'),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.author_atom,
+        name='profile_atom'
+    ),
     # Просмотр записи
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
     ),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
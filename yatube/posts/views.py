@@ -1,44 +1,92 @@
+from functools import partial
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
-
-from posts.models import Follow, Group, Post, User
-
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
+from django.views.decorators.http import require_GET
+
+from core.routers import read_from_replica
+from posts.models import Comment, Follow, Group, Post, User
+
+from . import comments as comment_queue
+from .cache import generations
+from .conditional import (group_condition, index_condition,
+                          post_condition, profile_condition)
+from .counters import get_user_counters
 from .forms import CommentForm, PostForm
+from .paginators import CommentPaginator, CountedPaginator, page_window
+from .search import search as search_posts
+from .thumbnails import enqueue as enqueue_thumbnails
+from .timeline import follow_page
 
 
-def paginator_page(request, page_pagi):
-    paginator = Paginator(page_pagi, settings.PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def paginator_page(request, page_pagi, **count_options):
+    paginator = CountedPaginator(page_pagi, settings.PER_PAGE, **count_options)
+    # Посты выбираются, только если фрагмента ленты нет в кэше.
+    page_obj = paginator.lazy_page_from_request(request)
     return {
         'page_obj': page_obj,
     }
 
 
+def comments_page(post_id, after=None):
+    """Страница активных комментариев поста после курсора after.
+
+    Больше COMMENTS_PER_PAGE комментариев за раз не выводится: остальные
+    догружаются по ссылке на posts:post_comments.
+    """
+    paginator = CommentPaginator(
+        Comment.objects.filter(
+            post_id=post_id, active=True).select_related('author'),
+        settings.COMMENTS_PER_PAGE)
+    return paginator.cursor_page(after=after)
+
+
+def feed_cache(*names):
+    """Контекст для кэша фрагмента, зависящего от областей names."""
+    return {
+        'feed_version': generations(*names),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+@read_from_replica
+@index_condition
 def index(request):
     """Выводит шаблон главной страницы"""
-    page_obj = paginator_page(request, Post.objects.all())
+    page_obj = paginator_page(
+        request, Post.objects.for_feed(), count_key='posts', estimate=True)
     context = page_obj
+    context.update(feed_cache('posts', 'users', 'groups'))
     return render(request, 'posts/index.html', context)
 
 
+@read_from_replica
+@group_condition
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    page_obj = paginator_page(request, group.posts.all())
+    page_obj = paginator_page(
+        request, Post.objects.for_group(group), count_key=f'group:{group.pk}')
     context = {
         'group': group,
     }
     context.update(page_obj)
+    context.update(feed_cache(f'group:{group.pk}', 'users'))
     return render(request, 'posts/group_list.html', context)
 
 
+@read_from_replica
+@profile_condition
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = paginator_page(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    posts = Post.objects.for_author(author)
+    counters = get_user_counters(author)
+    page_obj = paginator_page(request, posts, total=counters.posts_count)
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user, author=author)
     else:
@@ -46,33 +94,57 @@ def profile(request, username):
     context = {
         'posts': posts,
         'author': author,
+        'counters': counters,
         'following': following
     }
     context.update(page_obj)
+    context.update(feed_cache(f'author:{author.pk}', 'groups'))
     return render(request, 'posts/profile.html', context)
 
 
+@read_from_replica
+@post_condition
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.filter(active=True)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__counters'),
+        pk=post_id)
     form = CommentForm(request.POST)
     context = {
         'posts': post,
+        'author_counters': get_user_counters(post.author),
         'form': form,
-        'comments': comments,
+        # Выбирается, только если фрагмента нет в кэше.
+        'comments': SimpleLazyObject(partial(comments_page, post.pk)),
+        'pending_comments': comment_queue.pending(request, post.pk),
     }
+    context.update(feed_cache(f'post:{post.pk}', 'users'))
     return render(request, 'posts/post_detail.html', context)
 
 
+@require_GET
+@read_from_replica
+@post_condition
+def post_comments(request, post_id):
+    """HTML-фрагмент следующей страницы комментариев (?after=)."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return render(request, 'posts/includes/comments.html', {
+        'page': comments_page(post_id, request.GET.get('after')),
+        'post_id': post_id,
+    })
+
+
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        if settings.ASYNC_COMMENTS:
+            comment_queue.submit(request, post.pk, form.cleaned_data['text'])
+        else:
+            comment = form.save(commit=False)
+            comment.author = request.user
+            comment.post = post
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -83,6 +155,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        enqueue_thumbnails(post)
         return redirect('posts:profile', username=post.author)
     groups = Group.objects.all()
     return render(request, 'posts/create_post.html', {'form': form,
@@ -99,6 +172,8 @@ def post_edit(request, post_id):
         instance=post)
     if (form.is_valid() and request.user == post.author):
         form.save()
+        if 'image' in form.changed_data:
+            enqueue_thumbnails(post)
         return redirect('posts:post_detail', post_id=post.pk)
     context = {
         'form': form,
@@ -109,14 +184,31 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+def search(request):
+    """Поиск по текстам постов, результаты по релевантности."""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = Paginator(search_posts(query), settings.PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.page_window = page_window(
+            page_obj.number, paginator.num_pages)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@read_from_replica
 def follow_index(request):
-    foll_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_page(request, foll_list)
+    foll_list = Post.objects.for_follower(request.user)
     context = {
-        'foll_list': foll_list
+        'foll_list': foll_list,
+        'page_obj': follow_page(request),
     }
-    context.update(page_obj)
     return render(
         request,
         'posts/follow.html',
@@ -33,6 +33,19 @@ ALLOWED_HOSTS = [
 
 # number of posts per page
 PER_PAGE = 10
+# Комментариев в ответе post_detail и в одной догружаемой странице.
+COMMENTS_PER_PAGE = 50
+# Наибольший размер страницы JSON API (?limit=).
+API_MAX_LIMIT = 100
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписчиков, а подмешиваются в ленту при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+# Время жизни кэша фрагментов лент, сек.: устаревание ключей делают
+# счётчики поколений (posts.cache), а не срок жизни.
+FEED_CACHE_TIMEOUT = 60 * 60 * 3
+# Входит в ETag страниц лент (posts.conditional): увеличить при выкладке
+# изменённых шаблонов, чтобы клиенты не получили 304 на старую вёрстку.
+PAGE_ETAG_VERSION = 1
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -45,14 +58,30 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
-    'sorl.thumbnail'
 ]
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Каталог файловых очередей фоновых заданий (core.queue)
+QUEUE_ROOT = os.path.join(BASE_DIR, 'queue')
+# Комментарии пишутся в очередь и сохраняются пачками обработчиком
+# manage.py comment_worker; иначе — сразу в представлении add_comment.
+ASYNC_COMMENTS = False
+# Наибольшая пачка комментариев, записываемая одним bulk_create.
+COMMENT_BATCH_SIZE = 100
+# Размеры миниатюр постов, которые используют шаблоны: генерируются
+# фоновым обработчиком (manage.py thumbnail_worker) после загрузки.
+POST_THUMBNAIL_GEOMETRIES = ('1000', '200x200', '100x100')
+# Ширины картинок ленты для srcset и форматы в порядке предпочтения;
+# форматы, которые не поддерживает установленный Pillow, пропускаются.
+POST_IMAGE_WIDTHS = (320, 640, 1000)
+POST_IMAGE_FORMATS = ('avif', 'webp', 'jpeg')
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.QueryInspectionMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,21 +92,26 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
-    },
-]
+# Метрики запросов (core.metrics): сколько последних запросов каждого
+# представления учитывают перцентили /internal/metrics/ и с какой
+# длительности, мс, строка журнала пишется как предупреждение.
+PERFORMANCE_WINDOW = 1000
+PERFORMANCE_SLOW_REQUEST_MS = 500
+# Адреса, которым /internal/metrics/ и заголовок Server-Timing доступны
+# без входа сотрудника.
+INTERNAL_IPS = []
+# Server-Timing раскрывает число и время SQL-запросов, поэтому всем
+# клиентам он отдаётся только при DEBUG или с этим флагом.
+SERVER_TIMING_PUBLIC = False
+# Поиск N+1 и медленных запросов (core.queries): столько одинаковых по
+# форме запросов за HTTP-запрос считаются N+1; запросы дольше
+# SLOW_QUERY_MS, мс, попадают в журнал. Тесты (TEST_RUNNER) включают
+# строгий режим, в котором N+1 и превышение query_budget роняют тест.
+QUERY_INSPECTION = DEBUG
+QUERY_INSPECTION_STRICT = False
+QUERY_REPEAT_LIMIT = 3
+SLOW_QUERY_MS = 100
+TEST_RUNNER = 'core.testing.QueryInspectionRunner'
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
@@ -88,10 +122,50 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # YATUBE_DB — другой файл базы, например для данных бенчмарков.
+        'NAME': os.environ.get(
+            'YATUBE_DB', os.path.join(BASE_DIR, 'db.sqlite3')),
+        # Соединение живёт между запросами, а не открывается на каждый.
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 5,
+        },
     }
 }
 
+# Необязательная реплика только для чтения (копия базы SQLite, которую
+# обновляет репликация, например Litestream), путь — в YATUBE_REPLICA_DB.
+# Ленты и страницы постов читаются с неё (core.routers).
+REPLICA_DATABASE = None
+if os.environ.get('YATUBE_REPLICA_DB'):
+    REPLICA_DATABASE = 'replica'
+    DATABASES[REPLICA_DATABASE] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['YATUBE_REPLICA_DB'],
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_PIN_SECONDS = 10
+# При большем отставании реплики, сек., чтения идут в основную базу.
+REPLICA_MAX_LAG = 5
+REPLICA_LAG_CHECK_INTERVAL = 1
+# Поле, по самому свежему значению которого измеряется отставание.
+REPLICA_LAG_PROBE = 'posts.Post.pub_date'
+
+# PRAGMA для каждого нового соединения SQLite (core.db).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    # 256 МБ файла базы отображаются в память.
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер кэша страниц в КБ (64 МБ).
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -136,15 +210,25 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 # Путь к директории с шаблонами вынесен в переменную:
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Разобранные шаблоны хранятся в памяти процесса (cached.Loader), а
+# yatube/wsgi.py заранее компилирует все шаблоны из TEMPLATES_DIR. При
+# DEBUG файлы перечитываются на каждый запрос, чтобы правки были видны
+# сразу; YATUBE_TEMPLATE_CACHE=1 включает кэш и при DEBUG.
+TEMPLATE_CACHE = not DEBUG or bool(os.environ.get('YATUBE_TEMPLATE_CACHE'))
+# Шаблоны встроенных приложений (например, админки) ищутся
+# в директориях приложений
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        # Оставляем True: шаблоны встроенных приложений (например, админки)
-        # нужно искать в директориях приложений
-        # Добавлено: Искать шаблоны на уровне проекта
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ] if TEMPLATE_CACHE else TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -156,13 +240,55 @@ TEMPLATES = [
     }
 ]
 
+# Строки JSON с метриками каждого запроса пишутся на уровне INFO:
+# YATUBE_PERFORMANCE_LOG=INFO включает их, по умолчанию видны только
+# медленные запросы.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('YATUBE_PERFORMANCE_LOG', 'WARNING'),
+            'propagate': False,
+        },
+        'yatube.queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'users:logout'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+# Кэш в памяти процесса подходит только для разработки: у каждого
+# воркера gunicorn он свой. В бою задаётся общий для всех процессов
+# кэш: memcached (YATUBE_MEMCACHED=host:port, нужен python-memcached
+# из requirements.txt) или каталог на диске (YATUBE_CACHE_DIR). Общий
+# для процессов кэш нужен защите от лавины пересчётов (core.cache), но
+# add() у FileBasedCache не атомарен: два процесса могут одновременно
+# взять блокировку пересчёта, поэтому на нескольких процессах лучше
+# memcached.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+if os.environ.get('YATUBE_MEMCACHED'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ['YATUBE_MEMCACHED'],
+    }
+elif os.environ.get('YATUBE_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['YATUBE_CACHE_DIR'],
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
@@ -3,12 +3,16 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics
+
 urlpatterns = [
     path('', include('posts.urls')),
     path('admin/', admin.site.urls),
+    path('api/v1/', include('posts.api_urls')),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('internal/metrics/', metrics, name='metrics'),
 ]
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+if settings.TEMPLATE_CACHE:
+    # Модуль импортирует каждый рабочий процесс сервера: кэш шаблонов
+    # заполняется до первого запроса.
+    from core.template_cache import warm_up
+    warm_up()